@@ -0,0 +1,202 @@
+"""
+### Geração em lote: a árvore de vários roots em paralelo, em processos.
+
+- Cada root vira um arquivo de saída próprio (qualquer formato de
+  `exporters`), gerado em um processo de um `ProcessPoolExecutor`: a leitura
+  e a formatação são CPU-bound em Python, então threads não escalariam
+- Os parâmetros de `draw_tree` podem ser comuns a todos os roots ou
+  sobrescritos por root em um manifesto JSON
+- Ao final, cada root tem tempo, número de entradas e erro (se houve)
+
+Manifesto:
+    {
+      "defaults": {"ignore_folders": ["node_modules"], "format": "markdown"},
+      "roots": [
+        "servicos/pagamentos",
+        {"path": "servicos/busca", "max_depth": 3, "output": "busca.md"}
+      ]
+    }
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+from draw_structure_logic import ScanStats
+from exporters import EXPORT_EXTENSIONS, EXPORT_FORMATS, export_tree, open_export_file
+
+# Chaves aceitas em "defaults" e em cada root do manifesto, além de "path",
+# "output" e "format"
+TREE_PARAMS = (
+    "ignore_folders", "ignore_files", "ignore_extensions", "always_include",
+    "ignore_patterns", "use_ignore_files", "root_sort_key", "subdir_sort_key",
+    "max_depth", "max_entries_per_dir", "symlinks", "sizes", "source", "untracked",
+)
+
+
+class BatchJob:
+    """Um root do lote: de onde ler, onde gravar, em que formato e com quais parâmetros."""
+
+    __slots__ = ("root", "output", "fmt", "params")
+
+    def __init__(self, root, output, fmt="text", params=None):
+        self.root = root
+        self.output = output
+        self.fmt = fmt
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"BatchJob({self.root!r}, {self.output!r}, {self.fmt!r})"
+
+
+def _check_keys(options, where):
+    unknown = set(options) - set(TREE_PARAMS) - {"path", "output", "format"}
+    if unknown:
+        raise ValueError(f"{where}: chaves desconhecidas: {', '.join(sorted(unknown))}")
+    fmt = options.get("format")
+    if fmt is not None and fmt not in EXPORT_FORMATS:
+        raise ValueError(f"{where}: formato deve ser um de {EXPORT_FORMATS}: {fmt!r}")
+
+
+def load_manifest(path):
+    """
+    ### Lê um manifesto JSON e retorna `(defaults, roots)`.
+
+    - `roots` é uma lista de dicionários com ao menos `path`; caminhos
+      relativos partem da pasta do manifesto
+    - Levanta `ValueError` com chaves desconhecidas ou formato inválido
+    """
+
+    with open(path, encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    if isinstance(manifest, list):
+        manifest = {"roots": manifest}
+    defaults = manifest.get("defaults", {})
+    _check_keys(defaults, "defaults")
+    base = os.path.dirname(os.path.abspath(path))
+    roots = []
+    for i, item in enumerate(manifest.get("roots", [])):
+        options = {"path": item} if isinstance(item, str) else dict(item)
+        if "path" not in options:
+            raise ValueError(f"roots[{i}]: falta \"path\"")
+        _check_keys(options, f"roots[{i}]")
+        options["path"] = os.path.join(base, options["path"])
+        if "output" in options:
+            options["output"] = os.path.join(base, options["output"])
+        roots.append(options)
+    return defaults, roots
+
+
+def plan_jobs(roots, output_dir, defaults=None):
+    """
+    ### Monta os `BatchJob` a partir das opções de cada root.
+
+    - As opções do root têm precedência sobre `defaults` (listas substituem,
+      não somam)
+    - Sem `output`, o arquivo é `<output_dir>/<nome do root><extensão>`;
+      nomes repetidos ganham `-2`, `-3`...
+    """
+
+    defaults = defaults or {}
+    jobs = []
+    used = set()
+    for options in roots:
+        merged = {**defaults, **options}
+        fmt = merged.pop("format", "text")
+        root = merged.pop("path")
+        output = merged.pop("output", None)
+        if output is None:
+            name = os.path.basename(os.path.normpath(os.path.abspath(root)))
+            extension = EXPORT_EXTENSIONS[fmt]
+            output = os.path.join(output_dir, name + extension)
+            counter = 2
+            while os.path.normcase(output) in used:
+                output = os.path.join(output_dir, f"{name}-{counter}{extension}")
+                counter += 1
+        used.add(os.path.normcase(output))
+        jobs.append(BatchJob(root, output, fmt, merged))
+    return jobs
+
+
+def render_job(job):
+    """
+    ### Gera a saída de um root; roda dentro de um processo do pool.
+
+    - Nunca levanta: erros voltam no resultado e a saída parcial é apagada
+    - Retorna um dicionário com `root`, `output`, `seconds`, `entries`,
+      `error`, os contadores do `ScanStats` (`stats`) e a linha de
+      `ScanStats.summary()` (`summary`)
+    """
+
+    started = perf_counter()
+    stats = ScanStats()
+    result = {"root": job.root, "output": job.output, "entries": 0, "error": None}
+    try:
+        if not os.path.isdir(job.root):
+            raise NotADirectoryError(f"não é um diretório: {job.root}")
+        directory = os.path.dirname(job.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open_export_file(job.output) as handle:
+            result["entries"] = export_tree(job.root, handle, job.fmt, **job.params,
+                                            is_root=True, stats=stats)
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+        try:
+            os.remove(job.output)
+        except OSError:
+            pass
+    result["seconds"] = perf_counter() - started
+    result["stats"] = stats.as_dict()
+    result["summary"] = stats.summary()
+    return result
+
+
+def run_batch(jobs, processes=None, on_result=None):
+    """
+    ### Distribui os `jobs` entre `processes` processos (padrão: um por núcleo).
+
+    - Cada root é uma tarefa: quem termina pega o próximo, então roots grandes
+      não atrasam os pequenos
+    - `on_result(resultado)` é chamado conforme cada root termina
+    - Retorna os resultados na ordem dos `jobs`
+    """
+
+    results = [None] * len(jobs)
+    if not jobs:
+        return results
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(render_job, job): i for i, job in enumerate(jobs)}
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if on_result is not None:
+                    on_result(result)
+        except BaseException:
+            # Ex.: Ctrl+C; não espera os roots que ainda estão na fila
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
+
+
+def format_result(result):
+    """Linha do resumo de um root: tempo, situação, root e saída (ou o erro)."""
+
+    status = "erro" if result["error"] else "ok"
+    detail = result["error"] or f"{result['output']} ({result['entries']} entradas)"
+    return f"{result['seconds']:8.2f}s  {status:<4}  {result['root']}  ->  {detail}\n"
+
+
+def format_summary(results, elapsed):
+    """Linhas finais do lote: cada root (do mais lento ao mais rápido) e o total."""
+
+    lines = [format_result(result)
+             for result in sorted(results, key=lambda result: result["seconds"], reverse=True)]
+    failed = sum(1 for result in results if result["error"])
+    busy = sum(result["seconds"] for result in results)
+    lines.append(f"{len(results) - failed} de {len(results)} roots gerados em {elapsed:.2f}s "
+                 f"({busy:.2f}s somando os processos), {failed} com erro\n")
+    return lines
@@ -0,0 +1,304 @@
+"""
+### Benchmarks reproduzíveis de varredura e renderização.
+
+- Gera árvores sintéticas em um diretório temporário (sempre as mesmas para a
+  mesma `--scale`)
+- Mede tempo (melhor de `--repeat` rodadas), chamadas ao sistema de arquivos
+  (via `ScanStats` e contagem de `os.scandir`) e pico de memória
+  (`tracemalloc`) de `draw_tree`
+- Mede a partida a frio de `python -m dirtree` (caso `cli/cold_start`)
+- Com PyQt5 instalado, mede também `MainWindow.update_output` com saídas
+  grandes (plataforma Qt "offscreen", sem display)
+- `--output` grava o resultado em JSON; `--baseline` compara com um JSON
+  anterior e sai com código 1 se algum caso piorar além dos limites (o de
+  tempo é relativo e absoluto: `--time-threshold` e `--min-time-delta`)
+
+Uso:
+    python benchmarks/bench_tree.py --output atual.json
+    python benchmarks/bench_tree.py --baseline base.json --time-threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import draw_structure_logic  # noqa: E402
+from draw_structure_logic import ScanStats, draw_tree  # noqa: E402
+
+IGNORED_FOLDERS = ["node_modules", "__pycache__", ".git", "venv"]
+
+
+def _touch(path):
+    with open(path, "w"):
+        pass
+
+
+def make_wide_flat(root, scale):
+    """Um único diretório com muitos arquivos e algumas pastas."""
+
+    os.makedirs(root)
+    for i in range(2000 * scale):
+        _touch(os.path.join(root, f"file_{i:06d}.txt"))
+    for i in range(50 * scale):
+        os.mkdir(os.path.join(root, f"dir_{i:04d}"))
+
+
+def make_deep_narrow(root, scale):
+    """Uma cadeia longa de pastas com dois arquivos por nível."""
+
+    current = root
+    os.makedirs(current)
+    for i in range(200 * scale):
+        _touch(os.path.join(current, "a.py"))
+        _touch(os.path.join(current, "b.log"))
+        current = os.path.join(current, f"d{i % 10}")
+        os.mkdir(current)
+
+
+def make_mixed_ignored(root, scale):
+    """Projetos com `node_modules`/`__pycache__` pesados ao lado do código."""
+
+    for project in range(10 * scale):
+        base = os.path.join(root, f"project_{project:03d}")
+        os.makedirs(os.path.join(base, "src", "pkg"))
+        for i in range(20):
+            _touch(os.path.join(base, "src", "pkg", f"mod_{i}.py"))
+        for folder in ("node_modules", "__pycache__"):
+            for package in range(20):
+                package_dir = os.path.join(base, folder, f"p{package}")
+                os.makedirs(package_dir)
+                for i in range(10):
+                    _touch(os.path.join(package_dir, f"f{i}.js"))
+
+
+def make_symlinks(root, scale):
+    """Pastas reais e links para pastas e arquivos irmãos (sem ciclos)."""
+
+    real = os.path.join(root, "real")
+    links = os.path.join(root, "links")
+    os.makedirs(links)
+    for i in range(20 * scale):
+        folder = os.path.join(real, f"r{i:03d}")
+        os.makedirs(folder)
+        for j in range(20):
+            _touch(os.path.join(folder, f"f{j}.txt"))
+        os.symlink(folder, os.path.join(links, f"to_dir_{i:03d}"))
+        os.symlink(os.path.join(folder, "f0.txt"), os.path.join(links, f"to_file_{i:03d}"))
+
+
+SCENARIOS = {
+    "wide_flat": (make_wide_flat, {}),
+    "deep_narrow": (make_deep_narrow, {}),
+    "mixed_ignored": (make_mixed_ignored, {"ignore_folders": IGNORED_FOLDERS}),
+    "symlinks": (make_symlinks, {}),
+}
+
+
+class _ScandirCounter:
+    """Conta as aberturas de diretório feitas por `draw_structure_logic`."""
+
+    def __init__(self):
+        self.calls = 0
+        self._original = None
+
+    def __enter__(self):
+        self._original = draw_structure_logic.os.scandir
+
+        def counting_scandir(*args, **kwargs):
+            self.calls += 1
+            return self._original(*args, **kwargs)
+
+        draw_structure_logic.os.scandir = counting_scandir
+        return self
+
+    def __exit__(self, *exc_info):
+        draw_structure_logic.os.scandir = self._original
+
+
+def bench_draw_tree(root, params, repeat):
+    times = []
+    output = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = draw_tree(root, **params, is_root=True)
+        times.append(time.perf_counter() - start)
+
+    stats = ScanStats()
+    with _ScandirCounter() as scandir_counter:
+        draw_tree(root, **params, is_root=True, stats=stats)
+
+    tracemalloc.start()
+    draw_tree(root, **params, is_root=True)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall_s": min(times),
+        "scandir_calls": scandir_counter.calls,
+        "entries": stats.entries,
+        "stat_calls": stats.stat_calls,
+        "peak_bytes": peak,
+        "lines": output.count("\n"),
+    }, output
+
+
+def bench_cli_cold_start(root, repeat):
+    """
+    ### Tempo de `python -m dirtree` em um processo novo, até a última linha.
+
+    - Inclui a partida do interpretador; `interpreter_s` é a de um `python -c
+      pass`, para separar o custo dos imports do DirTree
+    - A meta documentada em `dirtree.py` é ficar abaixo de 60 ms
+    """
+
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def best(command):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=package_dir, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    return {
+        "wall_s": best([sys.executable, "-m", "dirtree", root, "--max-depth", "1"]),
+        "interpreter_s": best([sys.executable, "-c", "pass"]),
+    }
+
+
+def bench_gui_update_output(text, repeat):
+    """Tempo de `MainWindow.update_output` até o texto estar na tela."""
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return None
+
+    import main_app
+
+    qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+    main_app.app = qt_app
+    window = main_app.MainWindow()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        window.update_output(text)
+        window.tree_output.viewport().repaint()
+        qt_app.processEvents()
+        times.append(time.perf_counter() - start)
+    window.close()
+    return {"wall_s": min(times), "chars": len(text)}
+
+
+def run(scale, repeat, with_gui):
+    results = {
+        "meta": {
+            "scale": scale,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "draw_tree": {},
+        "gui_update_output": {},
+        "cli": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="dirtree_bench_")
+    try:
+        largest_output = ""
+        for name, (make, params) in SCENARIOS.items():
+            root = os.path.join(workdir, name)
+            make(root, scale)
+            results["draw_tree"][name], output = bench_draw_tree(root, params, repeat)
+            if len(output) > len(largest_output):
+                largest_output = output
+        results["cli"]["cold_start"] = bench_cli_cold_start(
+            os.path.join(workdir, "mixed_ignored"), repeat)
+        if with_gui:
+            for copies in (1, 10):
+                gui = bench_gui_update_output(largest_output * copies, repeat)
+                if gui is None:
+                    break
+                results["gui_update_output"][f"x{copies}"] = gui
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(current, baseline, time_threshold, memory_threshold, min_time_delta=0.0):
+    """
+    ### Lista as regressões de `current` em relação a `baseline`.
+
+    - Tempo e memória: falha se crescerem mais que o limite relativo
+    - Tempo: a piora também precisa passar de `min_time_delta` segundos; com
+      a `--scale` padrão os casos levam poucos milissegundos e o ruído do
+      sistema passa fácil de 20%
+    - Contagens de chamadas ao sistema: qualquer aumento é regressão
+    """
+
+    regressions = []
+    for group in ("draw_tree", "gui_update_output", "cli"):
+        for case, base in baseline.get(group, {}).items():
+            now = current.get(group, {}).get(case)
+            if now is None:
+                continue
+            if (now["wall_s"] > base["wall_s"] * (1 + time_threshold)
+                    and now["wall_s"] - base["wall_s"] > min_time_delta):
+                regressions.append(f"{group}/{case}: tempo {base['wall_s']:.4f}s -> {now['wall_s']:.4f}s")
+            if "peak_bytes" in base and now["peak_bytes"] > base["peak_bytes"] * (1 + memory_threshold):
+                regressions.append(f"{group}/{case}: memória {base['peak_bytes']} -> {now['peak_bytes']} bytes")
+            for counter in ("scandir_calls", "stat_calls"):
+                if counter in base and now[counter] > base[counter]:
+                    regressions.append(f"{group}/{case}: {counter} {base[counter]} -> {now[counter]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do DirTree.")
+    parser.add_argument("--scale", type=int, default=1, help="multiplicador do tamanho das árvores")
+    parser.add_argument("--repeat", type=int, default=5, help="rodadas por caso (vale a melhor)")
+    parser.add_argument("--no-gui", action="store_true", help="pula o caso de update_output")
+    parser.add_argument("--output", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--baseline", help="JSON de referência para comparar")
+    parser.add_argument("--time-threshold", type=float, default=0.20,
+                        help="piora relativa de tempo tolerada (padrão: 0.20)")
+    parser.add_argument("--min-time-delta", type=float, default=0.010,
+                        help="piora absoluta de tempo tolerada em segundos, somada ao limite "
+                             "relativo (padrão: 0.010)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10,
+                        help="piora relativa de memória tolerada (padrão: 0.10)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.repeat, not args.no_gui)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline.get("meta", {}).get("scale") != args.scale:
+            print("aviso: baseline gerado com outra --scale", file=sys.stderr)
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold,
+                              args.min_time_delta)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+### Daemon que mantém os modelos em memória e responde por um socket Unix.
+
+- Plugins de editor e scripts chamam o DirTree várias vezes para os mesmos
+  roots: o daemon guarda o modelo de cada root entre as chamadas, então só o
+  que mudou volta ao disco e não há partida do interpretador a cada consulta
+- Protocolo: uma requisição JSON por linha e uma resposta JSON por linha, na
+  mesma conexão (várias requisições podem seguir pela mesma conexão)
+- Antes de cada consulta o modelo é revalidado pelo mtime das pastas já lidas
+  (`snapshot_cache.revalidate`: um `stat` por pasta, só as alteradas são
+  relidas); com `source="git"`, o modelo é relido quando o `.git/index` muda
+- Se nada mudou, a saída já desenhada para os mesmos parâmetros é
+  reaproveitada: a consulta custa só a revalidação
+- Com tamanhos (`sizes` ou ordenação por tamanho/data), os arquivos recebem
+  um `stat` novo a cada consulta: alterar um arquivo não muda o mtime da pasta
+- Os roots menos usados saem da memória depois de `max_roots`
+
+Requisição:
+    {"root": "/caminho/absoluto", "params": {"max_depth": 2}, "format": "text"}
+    {"op": "ping"}  {"op": "forget", "root": "..."}  {"op": "shutdown"}
+
+Resposta:
+    {"ok": true, "output": "...", "warm": true, "cached": true, "refreshed": 0,
+     "elapsed_ms": 3.1, "stats": {...}, "summary": "..."}
+    {"ok": false, "error": "..."}
+"""
+
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from time import monotonic, perf_counter
+
+from batch import TREE_PARAMS
+from draw_structure_logic import (SIZE_SORT_KEYS, Entry, ScanStats, iter_dir_entries,
+                                  iter_tree_lines, tree_header)
+from exporters import EXPORT_FORMATS, export_tree
+from git_index import GitIndexError, find_work_tree, load_git_tree
+from snapshot_cache import revalidate
+
+# Roots mantidos em memória ao mesmo tempo
+MAX_ROOTS = 16
+# Saídas prontas guardadas por root (as mais recentes)
+OUTPUTS_PER_ROOT = 4
+
+
+def default_socket_path():
+    """
+    ### Caminho padrão do socket para o usuário atual.
+
+    - `DIRTREE_SOCKET` tem precedência; depois `$XDG_RUNTIME_DIR/dirtree.sock`
+      ou, sem ele, um arquivo com o uid no diretório temporário
+    """
+
+    override = os.environ.get("DIRTREE_SOCKET")
+    if override:
+        return override
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "dirtree.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f"dirtree-{uid}.sock")
+
+
+class WarmRoot:
+    """Modelo de um root (por fonte) guardado entre as consultas."""
+
+    __slots__ = ("tree", "lock", "checked_at", "stamp", "outputs")
+
+    def __init__(self):
+        self.tree = None
+        # Uma consulta por vez em cada root: renderizar preenche o modelo
+        self.lock = threading.Lock()
+        self.checked_at = None
+        # Com `source="git"`: (mtime, tamanho, inode) do índice lido
+        self.stamp = None
+        # Saídas já desenhadas por (formato, parâmetros); valem enquanto a
+        # revalidação não encontrar mudanças
+        self.outputs = OrderedDict()
+
+
+def _index_stamp(path):
+    _top, git_dir = find_work_tree(path)
+    try:
+        info = os.stat(os.path.join(git_dir, "index"))
+    except FileNotFoundError:
+        # Repositório sem nenhum `git add`: índice vazio
+        return None
+    return info.st_mtime_ns, info.st_size, info.st_ino
+
+
+def _forget_sizes(tree):
+    # Descarta os totais de `aggregate_sizes`: a próxima consulta com tamanhos
+    # refaz os `stat` e as sem tamanhos não os exportam
+    tree.size = tree.mtime = tree.file_count = None
+    for node in iter_dir_entries(tree):
+        for child in node.children:
+            child.size = child.mtime = child.file_count = None
+
+
+def render_output(path, tree, fmt, params, stats):
+    """Saída completa de `path` no formato `fmt`, a mesma da linha de comando."""
+
+    if fmt == "text":
+        output = "".join([tree_header(path),
+                          *iter_tree_lines(path, **params, is_root=True, stats=stats, tree=tree)])
+        stats.finish()
+        return output
+    handle = io.StringIO()
+    export_tree(path, handle, fmt, **params, is_root=True, stats=stats, tree=tree)
+    return handle.getvalue()
+
+
+class TreeDaemon:
+    """
+    ### Estado do daemon: os modelos quentes e o tratamento das requisições.
+
+    - `handle(request)` recebe um dicionário e retorna o dicionário de
+      resposta; nunca levanta
+    - `max_age` (segundos) evita revalidar o mesmo root em consultas muito
+      próximas; com 0, toda consulta revalida
+    """
+
+    def __init__(self, max_roots=MAX_ROOTS, max_age=0.0):
+        self.max_roots = max_roots
+        self.max_age = max_age
+        self.roots = OrderedDict()
+        self.lock = threading.Lock()
+
+    def handle(self, request):
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("a requisição deve ser um objeto JSON")
+            op = request.get("op", "render")
+            if op == "render":
+                return self.render(request)
+            if op == "ping":
+                with self.lock:
+                    return {"ok": True, "roots": sorted({key[0] for key in self.roots})}
+            if op == "forget":
+                return {"ok": True, "forgotten": self.forget(request["root"])}
+            if op == "shutdown":
+                return {"ok": True}
+            raise ValueError(f"operação desconhecida: {op!r}")
+        except KeyError as error:
+            return {"ok": False, "error": f"falta o campo {error}"}
+        except (GitIndexError, OSError, ValueError) as error:
+            return {"ok": False, "error": str(error)}
+        except Exception as error:
+            return {"ok": False, "error": f"{type(error).__name__}: {error}"}
+
+    def _warm_root(self, key):
+        with self.lock:
+            warm = self.roots.get(key)
+            if warm is None:
+                warm = self.roots[key] = WarmRoot()
+                while len(self.roots) > self.max_roots:
+                    self.roots.popitem(last=False)
+            else:
+                self.roots.move_to_end(key)
+            return warm
+
+    def forget(self, root):
+        path = os.path.normcase(os.path.abspath(root))
+        with self.lock:
+            keys = [key for key in self.roots if key[0] == path]
+            for key in keys:
+                del self.roots[key]
+        return len(keys)
+
+    def _refresh(self, warm, path, source, stats):
+        # Retorna quantas pastas foram relidas (-1: modelo montado de novo)
+        now = monotonic()
+        if source == "git":
+            # O stat vem antes da leitura: uma gravação no meio é vista na próxima
+            stamp = _index_stamp(path)
+            if warm.tree is None or stamp is None or stamp != warm.stamp:
+                warm.tree = load_git_tree(path, False, stats)
+                warm.stamp = stamp
+                return -1
+            return 0
+        if warm.tree is None:
+            warm.tree = Entry(os.path.basename(os.path.normpath(path)), path, True, False)
+            warm.checked_at = now
+            return -1
+        if warm.tree.children is None or now - warm.checked_at < self.max_age:
+            return 0
+        warm.checked_at = now
+        return revalidate(warm.tree, stats)
+
+    def render(self, request):
+        started = perf_counter()
+        params = dict(request.get("params") or {})
+        unknown = set(params) - set(TREE_PARAMS)
+        if unknown:
+            raise ValueError(f"parâmetros desconhecidos: {', '.join(sorted(unknown))}")
+        fmt = request.get("format", "text")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"formato deve ser um de {EXPORT_FORMATS}: {fmt!r}")
+        root = request["root"]
+        if not os.path.isdir(root):
+            raise NotADirectoryError(f"não é um diretório: {root}")
+        path = os.path.abspath(root)
+        source = params.pop("source", "disk")
+        untracked = params.pop("untracked", False)
+        with_sizes = (params.get("sizes") or params.get("root_sort_key") in SIZE_SORT_KEYS
+                      or params.get("subdir_sort_key") in SIZE_SORT_KEYS)
+        # Tamanhos e arquivos de regras mudam sem mudar o mtime das pastas:
+        # essas saídas são sempre desenhadas de novo
+        cache_key = (None if with_sizes or params.get("use_ignore_files")
+                     else json.dumps([fmt, params], sort_keys=True))
+        stats = ScanStats()
+        cached = False
+        if source == "git" and untracked:
+            # Os não rastreados vêm do disco sem mtime guardado: sempre relidos
+            tree = load_git_tree(path, True, stats)
+            output = render_output(path, tree, fmt, params, stats)
+            warm_hit, refreshed = False, -1
+        else:
+            warm = self._warm_root((os.path.normcase(path), source))
+            with warm.lock:
+                refreshed = self._refresh(warm, path, source, stats)
+                warm_hit = refreshed != -1
+                if refreshed:
+                    warm.outputs.clear()
+                output = warm.outputs.get(cache_key) if cache_key is not None else None
+                if output is not None:
+                    cached = True
+                    warm.outputs.move_to_end(cache_key)
+                elif with_sizes:
+                    try:
+                        output = render_output(path, warm.tree, fmt, params, stats)
+                    finally:
+                        _forget_sizes(warm.tree)
+                else:
+                    output = render_output(path, warm.tree, fmt, params, stats)
+                    if cache_key is not None:
+                        warm.outputs[cache_key] = output
+                        while len(warm.outputs) > OUTPUTS_PER_ROOT:
+                            warm.outputs.popitem(last=False)
+        # Revalidação e desenho: o mesmo resumo do `dirtree --stats`
+        stats.finish()
+        return {
+            "ok": True,
+            "output": output,
+            "warm": warm_hit,
+            "cached": cached,
+            "refreshed": max(refreshed, 0),
+            "elapsed_ms": round((perf_counter() - started) * 1000, 2),
+            "stats": stats.as_dict(),
+            "summary": stats.summary(),
+        }
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                request = None
+                response = {"ok": False, "error": f"JSON inválido: {error}"}
+            else:
+                response = self.server.tree_daemon.handle(request)
+            # `ensure_ascii` preserva nomes não UTF-8 (surrogates) no JSON
+            self.wfile.write((json.dumps(response) + "\n").encode("ascii"))
+            self.wfile.flush()
+            if isinstance(request, dict) and request.get("op") == "shutdown":
+                # `shutdown()` espera o laço do servidor: precisa de outra thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+def _claim_socket(socket_path):
+    # Remove um socket abandonado; recusa se houver um daemon respondendo ou
+    # se o caminho for outra coisa (arquivo, pasta, link), que nunca é apagada
+    try:
+        info = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(info.st_mode):
+        raise OSError(f"já existe e não é um socket: {socket_path}")
+    try:
+        query({"op": "ping"}, socket_path, timeout=1)
+    except OSError:
+        os.remove(socket_path)
+        return
+    raise OSError(f"já existe um daemon em {socket_path}")
+
+
+def serve(socket_path=None, max_roots=MAX_ROOTS, max_age=0.0, on_ready=None):
+    """
+    ### Atende requisições em `socket_path` até um `shutdown` (ou Ctrl+C).
+
+    - O socket é criado só com permissão para o usuário atual e removido ao
+      sair
+    - `on_ready(caminho)` é chamado quando o socket já aceita conexões
+    - Levanta `OSError` sem suporte a sockets Unix, com outro daemon ativo ou
+      se `socket_path` já existir e não for um socket
+    """
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("sockets Unix não são suportados neste sistema")
+    socket_path = socket_path or default_socket_path()
+    _claim_socket(socket_path)
+    previous_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(previous_umask)
+    server.daemon_threads = True
+    server.tree_daemon = TreeDaemon(max_roots, max_age)
+    try:
+        if on_ready is not None:
+            on_ready(socket_path)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+
+
+def query(request, socket_path=None, timeout=None):
+    """
+    ### Envia uma requisição ao daemon e retorna a resposta (dicionário).
+
+    - Levanta `OSError` se não houver daemon em `socket_path`
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall((json.dumps(request) + "\n").encode("ascii"))
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("o daemon fechou a conexão sem responder")
+    return json.loads(line)
+
@@ -0,0 +1,543 @@
+"""
+### Linha de comando do DirTree.
+
+- Uso: `python -m dirtree CAMINHO [opções]`
+- Subcomandos (primeiro argumento): `snapshot CAMINHO ARQUIVO` grava a
+  leitura de CAMINHO em ARQUIVO; `diff ANTES DEPOIS` compara duas leituras
+  (diretórios ou snapshots) e sai com código 1 se houver diferenças;
+  `batch CAMINHO... -o PASTA` gera um arquivo por root, em paralelo;
+  `daemon` mantém as árvores em memória e `query CAMINHO` consulta esse daemon
+- Não importa Qt: roda em CI, via SSH ou em qualquer máquina sem display
+- As linhas vão para a saída padrão conforme são geradas, em UTF-8 e com
+  "\\n", idênticas byte a byte ao texto da interface para os mesmos parâmetros
+- Meta de inicialização a frio: abaixo de 60 ms até a última linha de uma
+  árvore pequena, medida pelo caso `cli/cold_start` de
+  `benchmarks/bench_tree.py`. No topo só entram `argparse`, `os`, `sys` e
+  `draw_structure_logic` (que traz `ignore_rules`, `heapq` e `collections`;
+  o parser precisa das suas constantes); exportadores, snapshots, git, lote e
+  daemon são importados só nos caminhos que os usam. `python -X importtime
+  -m dirtree .` mostra o custo de cada import
+"""
+
+import argparse
+import os
+import sys
+
+from draw_structure_logic import (DEFAULT_WORKERS, FILTER_PARAMS, SIZE_SORT_KEYS, SORT_KEYS,
+                                  SOURCES, SYMLINK_POLICIES, Entry, ScanStats,
+                                  iter_largest_lines, iter_tree_lines,
+                                  scan_breadth_first, tree_header)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {value}")
+    return number
+
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {value}")
+    return number
+
+
+def add_filter_arguments(parser):
+    """Filtros, ordenação e limites de `draw_tree`, comuns à árvore e ao `batch`."""
+
+    parser.add_argument("-d", "--ignore-folder", dest="ignore_folders", action="append",
+                        default=[], metavar="NOME", help="pasta a ignorar, aceita globs (repetível)")
+    parser.add_argument("-f", "--ignore-file", dest="ignore_files", action="append",
+                        default=[], metavar="NOME", help="arquivo a ignorar, aceita globs (repetível)")
+    parser.add_argument("-e", "--ignore-extension", dest="ignore_extensions", action="append",
+                        default=[], metavar="EXT", help="extensão a ignorar, ex.: .log (repetível)")
+    parser.add_argument("-i", "--always-include", dest="always_include", action="append",
+                        default=[], metavar="NOME", help="nome que sempre aparece (repetível)")
+    parser.add_argument("-p", "--pattern", dest="ignore_patterns", action="append",
+                        default=[], metavar="PADRÃO",
+                        help="regra no formato .gitignore, ex.: '**/build/' ou '!keep.log' (repetível)")
+    parser.add_argument("--gitignore", dest="use_ignore_files", action="store_true",
+                        help="respeita os arquivos .gitignore e o .dockerignore do root")
+    parser.add_argument("--root-sort", dest="root_sort_key", choices=SORT_KEYS,
+                        default="dirs_first_az", help="ordenação do diretório raiz")
+    parser.add_argument("--subdir-sort", dest="subdir_sort_key", choices=SORT_KEYS,
+                        default="dirs_first_az", help="ordenação dos subdiretórios")
+    parser.add_argument("--max-depth", type=positive_int, default=None, metavar="N",
+                        help="mostra no máximo N níveis abaixo do root")
+    parser.add_argument("--max-entries", dest="max_entries_per_dir", type=positive_int, default=None,
+                        metavar="N", help="mostra no máximo N entradas por pasta")
+    parser.add_argument("--symlinks", choices=SYMLINK_POLICIES, default="follow",
+                        help="links simbólicos: seguir, não seguir, seguir uma vez ou seguir e marcar")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree",
+        description="Gera a estrutura de diretórios de CAMINHO no formato do DirTree.",
+    )
+    parser.add_argument("path", metavar="CAMINHO", help="diretório raiz")
+    add_filter_arguments(parser)
+    parser.add_argument("-j", "--workers", type=positive_int, default=None, metavar="N",
+                        help="lê as pastas em paralelo com N threads; a saída é a mesma")
+    parser.add_argument("--parallel", dest="workers", action="store_const", const=DEFAULT_WORKERS,
+                        help=f"o mesmo que --workers {DEFAULT_WORKERS} (o padrão da interface)")
+    parser.add_argument("--sizes", action="store_true",
+                        help="mostra o tamanho dos arquivos e os totais de cada pasta (como o du)")
+    parser.add_argument("--top", type=positive_int, default=None, metavar="N",
+                        help="em vez da árvore, lista os N maiores arquivos")
+    parser.add_argument("--top-dirs", action="store_true",
+                        help="com --top, lista as maiores pastas em vez de arquivos")
+    # Mesmos nomes de `exporters.EXPORT_FORMATS` (importado só quando usado)
+    parser.add_argument("--format", dest="fmt", default="text",
+                        choices=("text", "json", "ndjson", "markdown", "html"),
+                        help="formato da saída (padrão: text, o mesmo texto da interface)")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO",
+                        help="grava a saída em ARQUIVO em vez da saída padrão")
+    parser.add_argument("--source", choices=SOURCES, default="disk",
+                        help="git: lista só os arquivos rastreados, lendo o .git/index em vez "
+                             "do disco")
+    parser.add_argument("--untracked", action="store_true",
+                        help="com --source git, inclui os não rastreados que o .gitignore não exclui")
+    parser.add_argument("--time-budget", type=positive_float, default=None, metavar="SEGUNDOS",
+                        help="lê por níveis e para depois de SEGUNDOS; as pastas não lidas "
+                             "aparecem como [truncated]")
+    parser.add_argument("--entry-budget", type=positive_int, default=None, metavar="N",
+                        help="lê por níveis e para depois de listar N entradas")
+    parser.add_argument("--cache", action="store_true",
+                        help="parte do snapshot da execução anterior (só relê pastas com mtime "
+                             "diferente) e grava o snapshot ao final")
+    parser.add_argument("--stats", action="store_true",
+                        help="ao final, mostra contadores e tempos por fase na saída de erro")
+    return parser
+
+
+def tree_params(args):
+    """Parâmetros de `draw_tree` a partir dos argumentos, como na interface."""
+
+    return {
+        "ignore_folders": args.ignore_folders,
+        "ignore_files": args.ignore_files,
+        "ignore_extensions": args.ignore_extensions,
+        "always_include": args.always_include,
+        "root_sort_key": args.root_sort_key,
+        "subdir_sort_key": args.subdir_sort_key,
+        "max_depth": args.max_depth,
+        "max_entries_per_dir": args.max_entries_per_dir,
+        "ignore_patterns": args.ignore_patterns,
+        "use_ignore_files": args.use_ignore_files,
+        "symlinks": args.symlinks,
+        "workers": args.workers,
+        "sizes": args.sizes,
+        "source": args.source,
+        "untracked": args.untracked,
+        "unread": "truncated" if has_budget(args) else None,
+    }
+
+
+def has_budget(args):
+    return args.time_budget is not None or args.entry_budget is not None
+
+
+def write_lines(lines, stream=None):
+    """
+    ### Escreve as linhas em `stream` (padrão: stdout) conforme chegam.
+
+    - Grava bytes UTF-8 direto no buffer, sem a tradução de fim de linha do
+      modo texto, para manter a saída idêntica à da interface
+    - Em terminal, descarrega a cada linha; em pipe, deixa o buffer agrupar
+    """
+
+    stream = stream or sys.stdout.buffer
+    flush_each = hasattr(stream, "isatty") and stream.isatty()
+    for line in lines:
+        stream.write(line.encode("utf-8", "surrogateescape"))
+        if flush_each:
+            stream.flush()
+    stream.flush()
+
+
+def export(args, stats=None, tree=None):
+    """Saída via `exporters`, importado só aqui para não pesar na partida."""
+
+    import io
+
+    from exporters import export_tree, open_export_file
+
+    if args.output:
+        with open_export_file(args.output) as handle:
+            export_tree(args.path, handle, args.fmt, **tree_params(args),
+                        is_root=True, stats=stats, tree=tree)
+        return
+    handle = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8",
+                              errors="surrogateescape", newline="\n")
+    try:
+        export_tree(args.path, handle, args.fmt, **tree_params(args),
+                    is_root=True, stats=stats, tree=tree)
+        handle.flush()
+    finally:
+        handle.detach()
+
+
+def build_snapshot_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree snapshot",
+        description="Lê CAMINHO inteiro e grava o modelo em ARQUIVO, para usar com `dirtree diff`.",
+    )
+    parser.add_argument("path", metavar="CAMINHO", help="diretório raiz")
+    parser.add_argument("snapshot", metavar="ARQUIVO", help="arquivo de snapshot a gravar")
+    parser.add_argument("-d", "--ignore-folder", dest="ignore_folders", action="append",
+                        default=[], metavar="NOME", help="pasta a não ler, aceita globs (repetível)")
+    parser.add_argument("--stats", action="store_true",
+                        help="ao final, mostra contadores e tempos na saída de erro")
+    return parser
+
+
+def snapshot_main(argv):
+    args = build_snapshot_parser().parse_args(argv)
+    if not os.path.isdir(args.path):
+        print(f"dirtree: não é um diretório: {args.path}", file=sys.stderr)
+        return 2
+
+    from draw_structure_logic import scan_tree
+    from snapshot_cache import write_snapshot_file
+
+    stats = ScanStats() if args.stats else None
+    tree = scan_tree(args.path, stats, prune_folders=args.ignore_folders)
+    try:
+        write_snapshot_file(tree, args.snapshot)
+    except OSError as error:
+        print(f"dirtree: não foi possível gravar {args.snapshot}: {error}", file=sys.stderr)
+        return 2
+    if stats is not None:
+        print(stats.finish().summary(), file=sys.stderr)
+    return 0
+
+
+def build_diff_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree diff",
+        description="Compara duas leituras do mesmo root e desenha as entradas adicionadas (+), "
+                    "removidas (-) e que mudaram de tipo (~).",
+    )
+    parser.add_argument("old", metavar="ANTES", help="diretório ou snapshot de `dirtree snapshot`")
+    parser.add_argument("new", metavar="DEPOIS", help="diretório ou snapshot de `dirtree snapshot`")
+    parser.add_argument("-d", "--ignore-folder", dest="ignore_folders", action="append",
+                        default=[], metavar="NOME", help="pasta a ignorar, aceita globs (repetível)")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO",
+                        help="grava a saída em ARQUIVO em vez da saída padrão")
+    parser.add_argument("--counts", action="store_true",
+                        help="ao final, mostra o total de cada marcador na saída de erro")
+    parser.add_argument("--stats", action="store_true",
+                        help="ao final, mostra contadores e tempos da leitura de cada lado na "
+                             "saída de erro")
+    return parser
+
+
+def diff_main(argv):
+    args = build_diff_parser().parse_args(argv)
+
+    from snapshot_cache import SnapshotError
+    from tree_diff import diff_trees, iter_diff_lines, load_side
+
+    sides = []
+    side_stats = []
+    for source in (args.old, args.new):
+        stats = ScanStats() if args.stats else None
+        try:
+            sides.append(load_side(source, stats, prune_folders=args.ignore_folders))
+        except (OSError, ValueError, SnapshotError) as error:
+            print(f"dirtree: não foi possível ler {source}: {error}", file=sys.stderr)
+            return 2
+        if stats is not None:
+            side_stats.append((source, stats.finish()))
+    diff = diff_trees(*sides, ignore_folders=args.ignore_folders)
+    counts = {}
+    lines = iter_diff_lines(diff, counts, args.ignore_folders)
+    try:
+        if args.output:
+            with open(args.output, "wb") as handle:
+                write_lines(lines, handle)
+        else:
+            write_lines(lines)
+    except BrokenPipeError:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    if args.counts:
+        print(" ".join(f"{marker}{counts.get(marker, 0)}" for marker in "+-~"), file=sys.stderr)
+    for source, stats in side_stats:
+        print(f"{source}: {stats.summary()}", file=sys.stderr)
+    return 1 if diff.children else 0
+
+
+def build_batch_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree batch",
+        description="Gera a árvore de vários roots em paralelo (um processo por núcleo), "
+                    "cada um em seu próprio arquivo, e mostra o tempo de cada root ao final.",
+    )
+    parser.add_argument("paths", metavar="CAMINHO", nargs="*", help="diretórios raiz")
+    parser.add_argument("-m", "--manifest", metavar="ARQUIVO",
+                        help="manifesto JSON com \"defaults\" e \"roots\" (cada root pode "
+                             "sobrescrever as opções e definir \"output\")")
+    parser.add_argument("-o", "--output-dir", required=True, metavar="PASTA",
+                        help="pasta dos arquivos gerados (<nome do root>.<extensão>)")
+    parser.add_argument("-P", "--processes", type=positive_int, default=None, metavar="N",
+                        help="número de processos (padrão: um por núcleo)")
+    add_filter_arguments(parser)
+    parser.add_argument("--sizes", action="store_true",
+                        help="mostra o tamanho dos arquivos e os totais de cada pasta (como o du)")
+    parser.add_argument("--format", dest="format", default="text",
+                        choices=("text", "json", "ndjson", "markdown", "html"),
+                        help="formato dos arquivos (padrão: text)")
+    parser.add_argument("--source", choices=SOURCES, default="disk",
+                        help="git: lista só os arquivos rastreados, lendo o .git/index")
+    parser.add_argument("--untracked", action="store_true",
+                        help="com --source git, inclui os não rastreados que o .gitignore não exclui")
+    parser.add_argument("--stats", action="store_true",
+                        help="ao final, mostra contadores e tempos por fase de cada root na "
+                             "saída de erro")
+    return parser
+
+
+def batch_main(argv):
+    parser = build_batch_parser()
+    args = parser.parse_args(argv)
+    if not args.paths and not args.manifest:
+        parser.error("informe ao menos um CAMINHO ou --manifest")
+
+    from time import perf_counter
+
+    from batch import TREE_PARAMS, format_summary, load_manifest, plan_jobs, run_batch
+
+    # Precedência: padrões do parser < "defaults" do manifesto < opções da
+    # linha de comando < opções de cada root
+    defaults, roots = {}, []
+    if args.manifest:
+        try:
+            defaults, roots = load_manifest(args.manifest)
+        except (OSError, ValueError) as error:
+            print(f"dirtree: não foi possível ler {args.manifest}: {error}", file=sys.stderr)
+            return 2
+    options = {}
+    for name in TREE_PARAMS + ("format",):
+        value = getattr(args, name)
+        if name not in defaults or value != parser.get_default(name):
+            options[name] = value
+    defaults = {**defaults, **options}
+    roots = [{"path": path} for path in args.paths] + roots
+    for options in roots:
+        # Como no comando principal; o manifesto pode ligar `source` por root
+        merged = {**defaults, **options}
+        if merged.get("untracked") and merged.get("source") != "git":
+            parser.error(f"--untracked só funciona com --source git ({options['path']})")
+    jobs = plan_jobs(roots, args.output_dir, defaults)
+
+    started = perf_counter()
+    results = run_batch(jobs, args.processes)
+    elapsed = perf_counter() - started
+    write_lines(format_summary(results, elapsed))
+    if args.stats:
+        for result in results:
+            print(f"{result['root']}: {result['summary']}", file=sys.stderr)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+def build_daemon_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree daemon",
+        description="Mantém as árvores em memória e responde a `dirtree query` (e a plugins) "
+                    "por um socket Unix, revalidando pelo mtime das pastas a cada consulta.",
+    )
+    parser.add_argument("--socket", metavar="CAMINHO",
+                        help="socket a criar (padrão: $DIRTREE_SOCKET, "
+                             "$XDG_RUNTIME_DIR/dirtree.sock ou um arquivo no diretório temporário)")
+    parser.add_argument("--max-roots", type=positive_int, default=None, metavar="N",
+                        help="quantos roots ficam em memória (os menos usados saem primeiro)")
+    parser.add_argument("--max-age", type=positive_float, default=None, metavar="SEGUNDOS",
+                        help="não revalida um root consultado há menos de SEGUNDOS")
+    return parser
+
+
+def daemon_main(argv):
+    args = build_daemon_parser().parse_args(argv)
+
+    from daemon import MAX_ROOTS, serve
+
+    def ready(socket_path):
+        print(f"dirtree: atendendo em {socket_path}", file=sys.stderr)
+
+    try:
+        serve(args.socket, args.max_roots or MAX_ROOTS, args.max_age or 0.0, ready)
+    except KeyboardInterrupt:
+        return 0
+    except OSError as error:
+        print(f"dirtree: {error}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def build_query_parser():
+    parser = argparse.ArgumentParser(
+        prog="dirtree query",
+        description="Pede a árvore de CAMINHO a um `dirtree daemon` em execução; a saída é a "
+                    "mesma do comando principal, com o nome da pasta na primeira linha.",
+    )
+    parser.add_argument("path", metavar="CAMINHO", help="diretório raiz")
+    add_filter_arguments(parser)
+    parser.add_argument("--sizes", action="store_true",
+                        help="mostra o tamanho dos arquivos e os totais de cada pasta (como o du)")
+    parser.add_argument("--format", dest="format", default="text",
+                        choices=("text", "json", "ndjson", "markdown", "html"),
+                        help="formato da saída (padrão: text)")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO",
+                        help="grava a saída em ARQUIVO em vez da saída padrão")
+    parser.add_argument("--source", choices=SOURCES, default="disk",
+                        help="git: lista só os arquivos rastreados, lendo o .git/index")
+    parser.add_argument("--untracked", action="store_true",
+                        help="com --source git, inclui os não rastreados que o .gitignore não exclui")
+    parser.add_argument("--socket", metavar="CAMINHO", help="socket do daemon")
+    parser.add_argument("--stats", action="store_true",
+                        help="ao final, mostra o tempo da consulta e os contadores e tempos da "
+                             "leitura no daemon na saída de erro")
+    return parser
+
+
+def query_main(argv):
+    parser = build_query_parser()
+    args = parser.parse_args(argv)
+    if args.untracked and args.source != "git":
+        parser.error("--untracked só funciona com --source git")
+
+    from batch import TREE_PARAMS
+    from daemon import default_socket_path, query
+
+    # O daemon roda em outro diretório: o caminho vai absoluto
+    request = {
+        "root": os.path.abspath(args.path),
+        "params": {name: getattr(args, name) for name in TREE_PARAMS},
+        "format": args.format,
+    }
+    socket_path = args.socket or default_socket_path()
+    try:
+        response = query(request, socket_path)
+    except OSError as error:
+        print(f"dirtree: sem resposta do daemon em {socket_path} ({error}); "
+              "inicie com `dirtree daemon`", file=sys.stderr)
+        return 2
+    if not response.get("ok"):
+        print(f"dirtree: {response.get('error')}", file=sys.stderr)
+        return 2
+    try:
+        if args.output:
+            with open(args.output, "wb") as handle:
+                write_lines([response["output"]], handle)
+        else:
+            write_lines([response["output"]])
+    except BrokenPipeError:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    if args.stats:
+        state = "em cache" if response["cached"] else "quente" if response["warm"] else "fria"
+        print(f"{response['elapsed_ms']:.1f}ms no daemon ({state}, "
+              f"{response['refreshed']} pastas relidas)", file=sys.stderr)
+        print(response["summary"], file=sys.stderr)
+    return 0
+
+
+# Subcomandos reconhecidos no primeiro argumento; um diretório com um desses
+# nomes continua acessível como `./diff`
+SUBCOMMANDS = {
+    "snapshot": snapshot_main,
+    "diff": diff_main,
+    "batch": batch_main,
+    "daemon": daemon_main,
+    "query": query_main,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SUBCOMMANDS:
+        return SUBCOMMANDS[argv[0]](argv[1:])
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.top and args.fmt != "text":
+        parser.error("--top só funciona com --format text")
+    if args.cache and args.source != "disk":
+        parser.error("--cache só funciona com --source disk")
+    if args.untracked and args.source != "git":
+        parser.error("--untracked só funciona com --source git")
+    if has_budget(args) and (args.top or args.sizes or args.source != "disk"
+                             or args.root_sort_key in SIZE_SORT_KEYS
+                             or args.subdir_sort_key in SIZE_SORT_KEYS):
+        parser.error("--time-budget e --entry-budget não funcionam com --top, --sizes, "
+                     "ordenação por tamanho/data nem --source git")
+    if not os.path.isdir(args.path):
+        print(f"dirtree: não é um diretório: {args.path}", file=sys.stderr)
+        return 2
+
+    stats = ScanStats() if args.stats else None
+    tree = None
+    if args.cache:
+        from snapshot_cache import load_snapshot, save_snapshot
+
+        tree = load_snapshot(args.path, stats)
+        if tree is None:
+            tree = Entry(os.path.basename(os.path.normpath(args.path)), args.path, True, False)
+    elif args.source == "git":
+        # Montado aqui para que `--top` e os exportadores usem o mesmo modelo
+        from git_index import GitIndexError, load_git_tree
+
+        try:
+            tree = load_git_tree(args.path, args.untracked, stats)
+        except GitIndexError as error:
+            print(f"dirtree: {error}", file=sys.stderr)
+            return 2
+    if has_budget(args):
+        # Leitura por níveis até o orçamento acabar; o que faltou fica sem ler
+        # no modelo e é marcado na saída
+        if tree is None:
+            tree = Entry(os.path.basename(os.path.normpath(args.path)), args.path, True, False)
+        params = tree_params(args)
+        filters = {name: params[name] for name in FILTER_PARAMS}
+        for _pending, _done in scan_breadth_first(tree, stats, max_depth=args.max_depth,
+                                                  symlinks=args.symlinks,
+                                                  time_budget=args.time_budget,
+                                                  entry_budget=args.entry_budget,
+                                                  root_sort_key=args.root_sort_key,
+                                                  subdir_sort_key=args.subdir_sort_key,
+                                                  is_root=True,
+                                                  max_entries_per_dir=args.max_entries_per_dir,
+                                                  **filters):
+            pass
+    try:
+        if args.top:
+            write_lines([tree_header(args.path)])
+            params = tree_params(args)
+            filters = {name: params[name] for name in FILTER_PARAMS}
+            write_lines(iter_largest_lines(args.path, args.top, args.top_dirs, tree=tree,
+                                           stats=stats, **filters))
+        elif args.fmt != "text" or args.output:
+            export(args, stats, tree)
+        else:
+            lines = iter_tree_lines(args.path, **tree_params(args), is_root=True, stats=stats,
+                                    tree=tree)
+            write_lines([tree_header(args.path)])
+            write_lines(lines)
+    except BrokenPipeError:
+        # Ex.: `dirtree . | head`; evita o traceback ao fechar o stdout
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    if args.cache:
+        save_snapshot(tree)
+    if stats is not None:
+        print(stats.finish().summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
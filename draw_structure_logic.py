@@ -1,22 +1,930 @@
+import heapq
 import os
+from collections import deque
+from time import perf_counter, time_ns
+
+from ignore_rules import (DOCKERIGNORE_NAME, GITIGNORE_NAME, EntryFilter,
+                          GlobSet, RuleMatcher)
+
+# Chaves aceitas por `sort_entries` (mesma ordem do combobox da interface)
+SORT_KEYS = ("dirs_first_az", "dirs_first_za", "files_first_az", "files_first_za",
+             "size_desc", "size_asc", "mtime_desc", "mtime_asc")
+
+# Chaves que dependem de `aggregate_sizes`
+SIZE_SORT_KEYS = ("size_desc", "size_asc", "mtime_desc", "mtime_asc")
+
+# Parâmetros de `draw_tree` que decidem quais entradas aparecem (também
+# aceitos por `largest_entries`/`iter_largest_lines`)
+FILTER_PARAMS = ("ignore_files", "ignore_folders", "ignore_extensions", "always_include",
+                 "ignore_patterns", "use_ignore_files")
+
+# Políticas para links simbólicos (parâmetro `symlinks` de `draw_tree`)
+SYMLINK_POLICIES = ("follow", "no_follow", "follow_once", "follow_mark")
+
+# De onde vem a lista de entradas (parâmetro `source` de `draw_tree`)
+SOURCES = ("disk", "git")
+
+# mtimes mais recentes que isso (ns) não servem para revalidar snapshots: em
+# sistemas de arquivos com baixa resolução, uma mudança logo depois da
+# listagem teria o mesmo mtime
+RACY_WINDOW_NS = 2 * 1000 ** 3
+
+# Threads da leitura paralela quando o número não é informado; a espera é de
+# E/S, então vale ter mais threads que núcleos
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class ScanCancelled(Exception):
+    """Levantada quando `is_cancelled()` pede a interrupção da varredura."""
+
+
+class ScanStats:
+    """
+    ### Contadores e tempos de uma varredura.
+
+    - `dirs_visited`: diretórios que o `os.scandir` tentou abrir
+    - `entries`: quantas entradas foram listadas
+    - `entries_filtered`: quantas foram removidas pelos filtros
+    - `stat_calls`: chamadas de `stat` de fato feitas: o `stat` de
+      identidade de cada diretório aberto (usado para detectar ciclos), o de
+      tamanho e data (`sizes`) e o que `is_dir()` faz para seguir links. A
+      classificação das demais entradas vem do `d_type` do `scandir` e não
+      conta
+    - `permission_errors`/`not_found_errors`: diretórios pulados em silêncio
+    - `timings`: segundos por fase (`index`, `listing`, `stat`, `filter`,
+      `sort`, `render`) e `total`, preenchido por `finish()`; `index` é a
+      leitura do índice do git (`source="git"`)
+    - `on_finish(stats)` é chamado por `finish()`, para telemetria
+    """
+
+    PHASES = ("index", "listing", "stat", "filter", "sort", "render")
+
+    def __init__(self, on_finish=None):
+        self.dirs_visited = 0
+        self.entries = 0
+        self.entries_filtered = 0
+        self.stat_calls = 0
+        self.permission_errors = 0
+        self.not_found_errors = 0
+        self.timings = dict.fromkeys(self.PHASES, 0.0)
+        self.on_finish = on_finish
+        self._started = perf_counter()
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def record_error(self, error):
+        if isinstance(error, PermissionError):
+            self.permission_errors += 1
+        else:
+            self.not_found_errors += 1
+
+    def merge(self, other):
+        """Soma os contadores e tempos de `other` (ex.: de outra thread)."""
+
+        self.dirs_visited += other.dirs_visited
+        self.entries += other.entries
+        self.entries_filtered += other.entries_filtered
+        self.stat_calls += other.stat_calls
+        self.permission_errors += other.permission_errors
+        self.not_found_errors += other.not_found_errors
+        for phase, seconds in other.timings.items():
+            if phase != "total":
+                self.add_time(phase, seconds)
+
+    def finish(self):
+        self.timings["total"] = perf_counter() - self._started
+        if self.on_finish is not None:
+            self.on_finish(self)
+        return self
+
+    def as_dict(self):
+        return {
+            "dirs_visited": self.dirs_visited,
+            "entries": self.entries,
+            "entries_filtered": self.entries_filtered,
+            "stat_calls": self.stat_calls,
+            "permission_errors": self.permission_errors,
+            "not_found_errors": self.not_found_errors,
+            "timings": dict(self.timings),
+        }
+
+    def summary(self):
+        """Resumo de uma linha, usado na barra de status e no `--stats`."""
+
+        timings = " ".join(f"{phase}={self.timings[phase] * 1000:.1f}ms"
+                           for phase in self.PHASES if self.timings.get(phase))
+        timings_text = f" | {timings}" if timings else ""
+        total = self.timings.get("total")
+        total_text = f" | total={total * 1000:.1f}ms" if total is not None else ""
+        return (f"{self.dirs_visited} pastas, {self.entries} entradas "
+                f"({self.entries_filtered} filtradas), {self.stat_calls} stats, "
+                f"{self.permission_errors + self.not_found_errors} erros ignorados"
+                f"{timings_text}{total_text}")
+
+    def __repr__(self):
+        return f"ScanStats({self.as_dict()!r})"
+
+
+class Entry:
+    """
+    ### Entrada de diretório já classificada.
+
+    - Guarda o resultado de `DirEntry.is_dir()`/`is_file()` para que filtro,
+      ordenação e renderização não voltem ao sistema de arquivos
+    - `children` só é preenchido por `scan_tree`: lista crua (sem filtro nem
+      ordenação) das entradas de um diretório
+    - `is_link` vem de `DirEntry.is_symlink()`; `identity` guarda
+      `(st_dev, st_ino)` do diretório depois da primeira consulta
+    - `size`, `mtime` e `file_count` só existem depois de `aggregate_sizes`;
+      em pastas são os totais da subárvore
+    - `listed_mtime_ns` é o mtime da pasta lido junto com `identity`, antes
+      de a pasta ser listada; serve para revalidar snapshots (`snapshot_cache`)
+      e fica `None` se o mtime for recente demais para ser confiável
+    """
+
+    __slots__ = ("name", "path", "is_dir", "is_file", "children", "is_link", "identity",
+                 "size", "mtime", "file_count", "listed_mtime_ns")
+
+    def __init__(self, name, path, is_dir, is_file, children=None, is_link=False):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.is_file = is_file
+        self.children = children
+        self.is_link = is_link
+        self.identity = None
+        self.size = None
+        self.mtime = None
+        self.file_count = None
+        self.listed_mtime_ns = None
+
+    def __repr__(self):
+        return f"Entry({self.name!r}, is_dir={self.is_dir})"
+
+    def set_stat(self, info):
+        """Guarda tamanho, data e (em pastas) a identidade de um `stat`."""
+
+        self.size = info.st_size if self.is_file else 0
+        self.file_count = 1 if self.is_file else 0
+        self.mtime = info.st_mtime
+        # No Windows `DirEntry.stat()` não traz o inode
+        if self.is_dir and info.st_ino and self.identity is None:
+            self.identity = (info.st_dev, info.st_ino)
+            self.listed_mtime_ns = stable_mtime_ns(info)
+
+
+class Reference:
+    """
+    ### Entrada exibida com uma anotação no lugar do seu conteúdo.
+
+    - `kind == "cycle"`: link para um diretório ancestral
+    - `kind == "seen"`: diretório já listado em outro ponto da árvore
+    - `kind == "link"`: link simbólico marcado com o seu destino
+    - `kind == "pending"`/`"truncated"`: pasta do modelo ainda não lida, em
+      uma árvore parcial ou cortada pelo orçamento (ver `scan_breadth_first`)
+    - `target` é o caminho relativo ao root da primeira ocorrência (ou o
+      destino do link, para `"link"`); `None` nas pastas não lidas
+    """
+
+    __slots__ = ("entry", "kind", "target")
+
+    def __init__(self, entry, kind, target):
+        self.entry = entry
+        self.kind = kind
+        self.target = target
+
+    @property
+    def name(self):
+        return self.entry.name
+
+    @property
+    def is_dir(self):
+        return self.entry.is_dir
+
+    @property
+    def is_file(self):
+        return self.entry.is_file
+
+    @property
+    def suffix(self):
+        if self.kind == "link":
+            return f" -> {self.target}"
+        if self.target is None:
+            return f" [{self.kind}]"
+        return f" -> {self.target}/ [{self.kind}]"
+
+    def __repr__(self):
+        return f"Reference({self.entry.name!r}, {self.kind!r}, {self.target!r})"
+
+
+def entry_identity(entry, stats=None):
+    """
+    ### `(st_dev, st_ino)` do diretório, seguindo links; `None` se falhar.
+
+    - Calculado uma vez e guardado no `Entry`
+    """
+
+    if entry.identity is None:
+        if stats is not None:
+            stats.stat_calls += 1
+        try:
+            info = os.stat(entry.path)
+        except OSError:
+            return None
+        entry.identity = (info.st_dev, info.st_ino)
+        entry.listed_mtime_ns = stable_mtime_ns(info)
+    return entry.identity
+
+
+def stable_mtime_ns(info):
+    """`st_mtime_ns` de `info`, ou `None` se for recente demais (ver `RACY_WINDOW_NS`)."""
+
+    if time_ns() - info.st_mtime_ns < RACY_WINDOW_NS:
+        return None
+    return info.st_mtime_ns
+
+
+def _link_target(entry):
+    try:
+        return os.readlink(entry.path)
+    except OSError:
+        return "?"
+
+
+class Overflow:
+    """
+    ### Resumo das entradas cortadas por `max_entries_per_dir`.
+
+    - Aparece como último item do diretório, no lugar das entradas omitidas
+    """
+
+    __slots__ = ("files", "dirs")
+
+    is_dir = False
+    is_file = False
+
+    def __init__(self, files, dirs):
+        self.files = files
+        self.dirs = dirs
+
+    @property
+    def name(self):
+        return f"… ({self.files} more files, {self.dirs} more dirs)"
+
+    def __repr__(self):
+        return f"Overflow(files={self.files}, dirs={self.dirs})"
+
+
+def _stat_entry(entry, dir_entry=None, stats=None):
+    # Um `stat` por entrada; links quebrados ficam com tamanho e data zerados.
+    # Em um link, `DirEntry.stat()` reaproveita o `stat` feito por `is_dir()`
+    # (que só não fica guardado se o link estiver quebrado)
+    if stats is not None and (dir_entry is None or not entry.is_link
+                              or not (entry.is_dir or entry.is_file)):
+        stats.stat_calls += 1
+    try:
+        info = dir_entry.stat() if dir_entry is not None else os.stat(entry.path)
+    except OSError:
+        entry.size = entry.file_count = 0
+        entry.mtime = 0.0
+        return
+    entry.set_stat(info)
+
+
+def list_entries(root_path, stats=None, with_stat=False):
+    """
+    ### Lista um diretório com `os.scandir` classificando cada entrada uma vez.
+
+    - `is_dir()` segue links simbólicos, como o antigo `os.path.isdir`
+    - `is_file()` só é consultado quando a entrada não é diretório
+    - Levanta `PermissionError`/`FileNotFoundError` como o `os.listdir`
+    - Com `stats`, separa o tempo de classificação (`stat`) do resto da
+      listagem (`listing`)
+    - `with_stat=True` também preenche `size`/`mtime` com `DirEntry.stat()`
+      (de graça no Windows, um `stat` por entrada nos demais sistemas)
+    """
+
+    entries = []
+    if stats is None and not with_stat:
+        with os.scandir(root_path) as it:
+            for dir_entry in it:
+                try:
+                    is_dir = dir_entry.is_dir()
+                    is_file = not is_dir and dir_entry.is_file()
+                    is_link = dir_entry.is_symlink()
+                except OSError:
+                    is_dir = is_file = is_link = False
+                entries.append(Entry(dir_entry.name, dir_entry.path, is_dir, is_file,
+                                     is_link=is_link))
+        return entries
+
+    if stats is not None:
+        stats.dirs_visited += 1
+    started = perf_counter()
+    stat_time = 0.0
+    with os.scandir(root_path) as it:
+        for dir_entry in it:
+            stat_started = perf_counter()
+            try:
+                is_dir = dir_entry.is_dir()
+                is_file = not is_dir and dir_entry.is_file()
+                is_link = dir_entry.is_symlink()
+            except OSError:
+                is_dir = is_file = is_link = False
+            entry = Entry(dir_entry.name, dir_entry.path, is_dir, is_file, is_link=is_link)
+            if is_link and stats is not None:
+                # `is_dir()` segue o link com um `stat`; se o link estiver
+                # quebrado, `is_file()` tenta outra vez
+                stats.stat_calls += 1 if is_dir or is_file else 2
+            if with_stat:
+                _stat_entry(entry, dir_entry, stats)
+            stat_time += perf_counter() - stat_started
+            if stats is not None:
+                stats.entries += 1
+            entries.append(entry)
+    if stats is not None:
+        stats.add_time("stat", stat_time)
+        stats.add_time("listing", perf_counter() - started - stat_time)
+    return entries
+
+
+def _prefetch_job(entry, with_stats):
+    # Roda em uma thread do pool: estatísticas próprias, somadas só quando o
+    # percurso consome a listagem. O stat de identidade fica de fora: o
+    # percurso sequencial também o faz nas pastas que não abre
+    identity_stat = entry.identity is None
+    entry_identity(entry)
+    local_stats = ScanStats() if with_stats else None
+    try:
+        return list_entries(entry.path, local_stats), local_stats, identity_stat, None
+    except OSError as error:
+        return None, local_stats, identity_stat, error
+
+
+class Prefetcher:
+    """
+    ### Lê diretórios antecipadamente em um pool de threads limitado.
+
+    - `schedule(entries)` enfileira as pastas que o percurso vai abrir; a
+      fila é uma pilha, então as pastas mais profundas e as primeiras da
+      lista são lidas antes, seguindo a ordem do percurso em profundidade
+    - Cada tarefa faz o `stat` de identidade e a listagem do diretório
+    - `take(entry, stats)` devolve a listagem pronta (esperando se preciso);
+      pastas que ainda não foram enviadas ao pool são lidas na thread atual
+    - O consumo acontece sempre na ordem do percurso, então a saída é a mesma
+      da leitura sequencial; as estatísticas de cada tarefa são somadas a
+      `stats` nesse momento. Pastas descartadas (`[seen]`, `[cycle]`) só
+      contam o `stat` de identidade, como na leitura sequencial
+    - No máximo `workers * 4` leituras ficam em andamento ou prontas sem
+      consumo, o que limita a memória usada pela leitura antecipada
+    """
+
+    def __init__(self, workers, with_stats=False):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.pool = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix="dirtree-scan")
+        self.limit = workers * 4
+        self.with_stats = with_stats
+        self.waiting = []
+        self.waiting_set = set()
+        self.futures = {}
+        self.ready = {}
+
+    def schedule(self, entries):
+        for entry in reversed(entries):
+            self.waiting.append(entry)
+            self.waiting_set.add(entry)
+        self._top_up()
+
+    def _top_up(self):
+        while self.waiting and len(self.futures) + len(self.ready) < self.limit:
+            entry = self.waiting.pop()
+            if entry not in self.waiting_set:
+                continue
+            self.waiting_set.discard(entry)
+            self.futures[entry] = self.pool.submit(_prefetch_job, entry, self.with_stats)
+
+    def wait(self, entry, stats=None):
+        """Espera a tarefa de `entry`, se houver, e conta o `stat` de identidade."""
+
+        self.waiting_set.discard(entry)
+        future = self.futures.pop(entry, None)
+        if future is None:
+            return
+        entries, local_stats, identity_stat, error = future.result()
+        if stats is not None and identity_stat:
+            stats.stat_calls += 1
+        self.ready[entry] = (entries, local_stats, error)
+
+    def take(self, entry, stats=None):
+        self.wait(entry, stats)
+        result = self.ready.pop(entry, None)
+        self._top_up()
+        if result is None:
+            return list_entries(entry.path, stats)
+        entries, local_stats, error = result
+        if stats is not None and local_stats is not None:
+            stats.merge(local_stats)
+        if error is not None:
+            raise error
+        return entries
+
+    def discard(self, entry):
+        """Esquece `entry` (ex.: pasta repetida que não será aberta) e as suas estatísticas."""
+
+        self.waiting_set.discard(entry)
+        self.ready.pop(entry, None)
+        future = self.futures.pop(entry, None)
+        if future is not None:
+            future.cancel()
+        self._top_up()
+
+    def close(self):
+        self.waiting.clear()
+        self.waiting_set.clear()
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.ready.clear()
+        self.pool.shutdown(wait=False)
+
+
+def scan_tree(root_path, stats=None, is_cancelled=None, max_depth=None, prune_folders=None):
+    """
+    ### Lê a árvore inteira uma única vez e a mantém em memória.
+
+    - Retorna o `Entry` do root com `children` preenchido em todos os níveis
+    - Nada é filtrado nem ordenado aqui: filtros e ordenação são aplicados por
+      `draw_tree(..., tree=...)` sem novo acesso ao disco
+    - Diretórios sem permissão ficam com `children` vazio
+    - `is_cancelled` é consultado a cada diretório; se retornar True a
+      varredura para com `ScanCancelled`
+    - Com `max_depth`, só os `max_depth` primeiros níveis são lidos; as pastas
+      do último nível ficam com `children = None` (não lidas)
+    - Pastas que casam com `prune_folders` (nomes ou globs, como em
+      `ignore_folders`) também não são lidas; o modelo só serve para
+      renderizações que continuem ignorando essas pastas
+    - Links são seguidos, mas cada diretório (por `(st_dev, st_ino)`) é lido
+      uma única vez: ciclos e repetições ficam com `children = None`
+    """
+
+    root = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+    _scan_into(root, stats, is_cancelled, max_depth, prune_folders)
+    return root
+
+
+def _scan_into(root, stats=None, is_cancelled=None, max_depth=None, prune_folders=None):
+    """Preenche `children` de `root` e dos diretórios abaixo dele."""
+
+    pruned = GlobSet(prune_folders)
+    visited = {entry_identity(root, stats)}
+    stack = [(root, 1, "")]
+    while stack:
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(root.path)
+        node, level, rel_dir = stack.pop()
+        try:
+            node.children = list_entries(node.path, stats)
+        except (PermissionError, FileNotFoundError) as error:
+            if stats is not None:
+                stats.record_error(error)
+            node.children = []
+            # Listagem vazia por erro: um snapshot não deve confiar nela
+            node.listed_mtime_ns = None
+        if max_depth is not None and level >= max_depth:
+            continue
+        for entry in node.children:
+            if not entry.is_dir:
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if pruned and pruned.match(entry.name, rel_path):
+                continue
+            identity = entry_identity(entry, stats)
+            if identity is not None:
+                if identity in visited:
+                    continue
+                visited.add(identity)
+            stack.append((entry, level + 1, rel_path))
+
+
+def scan_breadth_first(root, stats=None, is_cancelled=None, max_depth=None, symlinks="follow",
+                       interval=None, time_budget=None, entry_budget=None, ignore_files=None,
+                       ignore_folders=None, ignore_extensions=None, always_include=None,
+                       ignore_patterns=None, use_ignore_files=False,
+                       root_sort_key="dirs_first_az", subdir_sort_key="dirs_first_az",
+                       is_root=False, max_entries_per_dir=None):
+    """
+    ### Lê o modelo `root` nível por nível, com orçamento opcional.
+
+    - Gerador: logo depois de ler o root e depois a cada `interval` segundos
+      gera `(pastas_pendentes, False)`, para quem chama desenhar a árvore
+      parcial (`draw_tree(..., unread="pending")`); ao final gera
+      `(pastas_pendentes, True)`
+    - `time_budget` (segundos) e `entry_budget` (entradas listadas) param a
+      leitura antes do fim: as pastas que faltam ficam com `children = None`
+      e aparecem com `unread="truncated"`. Sem orçamento, o último valor tem
+      0 pastas pendentes
+    - Pastas já lidas no modelo não voltam ao disco
+    - `max_depth`, `symlinks` e os filtros de `draw_tree` (`FILTER_PARAMS`)
+      limitam a leitura como no percurso: pastas que a árvore não mostraria
+      (ocultas, ignoradas ou excluídas por regras `.gitignore`) não são lidas
+      nem gastam o orçamento
+    - As subpastas entram na fila na ordem da árvore (`root_sort_key` no root
+      se `is_root`, `subdir_sort_key` nas demais), então um orçamento curto
+      corta as últimas; com `max_entries_per_dir`, as que a árvore esconderia
+      no `… (N more …)` não são enfileiradas
+    - Uma pasta que aparece por dois caminhos (link ou bind mount) é lida
+      nos dois, porque o percurso em profundidade pode chegar antes a
+      qualquer um deles; só os ciclos (link para um ancestral) não são lidos
+    """
+
+    entry_filter = EntryFilter(ignore_files, ignore_folders, ignore_extensions, always_include)
+    started = last_emit = perf_counter()
+    listed = 0
+    # Cada item: (pasta, nível, caminho relativo, cadeia de identidades dos
+    # ancestrais como `(identidade, cadeia_do_pai)`, se está dentro de um
+    # link, regras `.gitignore` em vigor para as entradas da pasta)
+    queue = deque([(root, 1, "", (entry_identity(root, stats), None), False,
+                    root_rule_matchers(root.path, ignore_patterns, use_ignore_files))])
+    while queue:
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(root.path)
+        now = perf_counter()
+        if time_budget is not None and now - started >= time_budget:
+            break
+        if entry_budget is not None and listed >= entry_budget:
+            break
+        if interval is not None and now - last_emit >= interval:
+            yield len(queue), False
+            last_emit = perf_counter()
+        node, level, rel_dir, chain, in_link, matchers = queue.popleft()
+        if node.children is None:
+            try:
+                node.children = list_entries(node.path, stats)
+            except (PermissionError, FileNotFoundError) as error:
+                if stats is not None:
+                    stats.record_error(error)
+                node.children = []
+                node.listed_mtime_ns = None
+            listed += len(node.children)
+        if max_depth is None or level < max_depth:
+            if use_ignore_files:
+                matchers = with_gitignore(matchers, node, node.children, rel_dir)
+            sort_key = root_sort_key if is_root and node is root else subdir_sort_key
+            entries = sort_entries(entry_filter.filter(node.children, rel_dir, matchers),
+                                   node.path, sort_key)
+            if max_entries_per_dir is not None:
+                entries = entries[:max_entries_per_dir]
+            for entry in entries:
+                if not entry.is_dir:
+                    continue
+                if entry.is_link and (symlinks == "no_follow"
+                                      or (symlinks == "follow_once" and in_link)):
+                    continue
+                identity = entry_identity(entry, stats)
+                if identity is not None and _in_chain(identity, chain):
+                    continue
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                queue.append((entry, level + 1, rel_path, (identity, chain),
+                              in_link or entry.is_link, matchers))
+        if interval is not None and node is root and queue:
+            # O primeiro nível aparece assim que o root é lido
+            yield len(queue), False
+            last_emit = perf_counter()
+    yield len(queue), True
+
+
+def _in_chain(identity, chain):
+    while chain is not None:
+        if chain[0] == identity:
+            return True
+        chain = chain[1]
+    return False
+
+
+def aggregate_sizes(root, stats=None, is_cancelled=None, prune_folders=None):
+    """
+    ### Soma tamanho, número de arquivos e data mais recente de cada pasta.
+
+    - Percurso em pós-ordem sobre o modelo (sem recursão): cada pasta é
+      totalizada depois dos seus filhos, na mesma passada que lê o disco
+    - Pastas ainda não lidas (`children is None`) são lidas com `stat`; as já
+      lidas só recebem o `stat` das entradas que ainda não têm tamanho, então
+      depois de uma atualização do `TreeWatcher` só o que mudou volta ao disco
+    - Os totais contam tudo o que está no disco abaixo da pasta, como o `du`
+      (tamanho aparente), exceto pastas de `prune_folders` (nunca lidas, ficam
+      com `size = None`)
+    - Links simbólicos não entram nos totais da pasta pai (como no `du`), mas
+      pastas apontadas por links também são totalizadas. Cada diretório é lido
+      uma única vez: os links são resolvidos depois das pastas reais, e as
+      ocorrências repetidas recebem uma cópia dos totais sem entrar na soma.
+      Se uma ocorrência repetida já tem `children` no modelo, o conteúdo dela
+      também recebe os valores da ocorrência lida
+    - `mtime` de uma pasta é o mais recente entre ela e o seu conteúdo
+    - Retorna `root`
+    """
+
+    pruned = GlobSet(prune_folders)
+    if root.mtime is None:
+        _stat_entry(root, stats=stats)
+    visited = {entry_identity(root, stats): root}
+    repeated = []
+    links = []
+    stack = [(root, "", False)]
+    while stack or links:
+        if not stack:
+            link, rel_path = links.pop()
+            identity = entry_identity(link, stats)
+            if identity is not None:
+                if identity in visited:
+                    repeated.append((link, visited[identity]))
+                    continue
+                visited[identity] = link
+            stack.append((link, rel_path, False))
+            continue
+        node, rel_dir, folded = stack.pop()
+        if folded:
+            size = file_count = 0
+            mtime = node.mtime
+            for child in node.children:
+                if child.size is None or child.is_link:
+                    continue
+                size += child.size
+                file_count += child.file_count
+                if child.mtime > mtime:
+                    mtime = child.mtime
+            node.size, node.file_count, node.mtime = size, file_count, mtime
+            continue
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(root.path)
+        if node.children is None:
+            node.children = []
+            try:
+                node.children = list_entries(node.path, stats, with_stat=True)
+            except (PermissionError, FileNotFoundError) as error:
+                if stats is not None:
+                    stats.record_error(error)
+                node.listed_mtime_ns = None
+        stack.append((node, rel_dir, True))
+        for child in node.children:
+            if child.mtime is None:
+                _stat_entry(child, stats=stats)
+            if not child.is_dir:
+                continue
+            child.size = None
+            rel_path = f"{rel_dir}/{child.name}" if rel_dir else child.name
+            if pruned and pruned.match(child.name, rel_path):
+                continue
+            if child.is_link:
+                links.append((child, rel_path))
+                continue
+            identity = entry_identity(child, stats)
+            if identity is not None:
+                if identity in visited:
+                    repeated.append((child, visited[identity]))
+                    continue
+                visited[identity] = child
+            stack.append((child, rel_path, False))
+    for child, first in repeated:
+        child.size, child.file_count, child.mtime = first.size, first.file_count, first.mtime
+    # Ocorrências repetidas que já têm `children` no modelo (ex.: um link que o
+    # percurso abriu antes da pasta real) são as que `_walk_tree` expande: o
+    # conteúdo recebe os valores da ocorrência totalizada
+    stack = [child for child, _first in repeated if child.children]
+    while stack:
+        node = stack.pop()
+        first = visited.get(entry_identity(node, stats))
+        if first is None or first is node or not first.children:
+            continue
+        by_name = {child.name: child for child in first.children}
+        for child in node.children:
+            source = by_name.get(child.name)
+            if child.is_dir:
+                source = visited.get(entry_identity(child, stats), source)
+                if source is child:
+                    continue
+                if child.children:
+                    stack.append(child)
+            if source is not None:
+                child.size, child.file_count, child.mtime = (source.size, source.file_count,
+                                                             source.mtime)
+    return root
+
+
+def root_rule_matchers(root_path, ignore_patterns=None, use_ignore_files=False):
+    """Regras no formato `.gitignore` válidas desde o root (`ignore_patterns` e `.dockerignore`)."""
+
+    matchers = []
+    if ignore_patterns:
+        matcher = RuleMatcher.from_lines(ignore_patterns)
+        if matcher is not None:
+            matchers.append(matcher)
+    if use_ignore_files:
+        # O .dockerignore só existe no root e suas regras são sempre ancoradas
+        matcher = RuleMatcher.from_file(os.path.join(root_path, DOCKERIGNORE_NAME),
+                                        anchored=True)
+        if matcher is not None:
+            matchers.append(matcher)
+    return matchers
+
+
+def with_gitignore(matchers, entry, entries, rel_dir):
+    """`matchers` mais o `.gitignore` da pasta `entry`, se ele estiver em `entries`."""
+
+    if any(child.name == GITIGNORE_NAME and child.is_file for child in entries):
+        matcher = RuleMatcher.from_file(os.path.join(entry.path, GITIGNORE_NAME), rel_dir)
+        if matcher is not None:
+            return matchers + [matcher]
+    return matchers
+
+
+def largest_entries(tree, count, dirs=False, ignore_files=None, ignore_folders=None,
+                    ignore_extensions=None, always_include=None, ignore_patterns=None,
+                    use_ignore_files=False):
+    """
+    ### As `count` maiores entradas do modelo já agregado.
+
+    - Arquivos por padrão; com `dirs=True`, pastas (pelo total da subárvore)
+    - Os filtros são os de `draw_tree` (ocultos, `ignore_*`, `always_include`
+      e regras `.gitignore`): só entra o que a árvore mostraria
+    - Links simbólicos ficam de fora: o conteúdo já aparece pelo caminho real.
+      Uma pasta que aparece por mais de um caminho (ex.: bind mount) entra uma
+      única vez, pela identidade `(st_dev, st_ino)`
+    - Retorna `(tamanho, caminho_relativo, entry)` do maior para o menor
+    """
+
+    entry_filter = EntryFilter(ignore_files, ignore_folders, ignore_extensions, always_include)
+
+    def candidates():
+        seen = {entry_identity(tree)}
+        stack = [(tree, "", root_rule_matchers(tree.path, ignore_patterns, use_ignore_files))]
+        while stack:
+            node, rel_dir, matchers = stack.pop()
+            entries = node.children or ()
+            if use_ignore_files:
+                matchers = with_gitignore(matchers, node, entries, rel_dir)
+            for child in entry_filter.filter(entries, rel_dir, matchers):
+                if child.size is None or child.is_link:
+                    continue
+                rel_path = f"{rel_dir}/{child.name}" if rel_dir else child.name
+                if child.is_dir:
+                    identity = entry_identity(child)
+                    if identity is not None:
+                        if identity in seen:
+                            continue
+                        seen.add(identity)
+                    if dirs:
+                        yield child.size, rel_path, child
+                    stack.append((child, rel_path, matchers))
+                elif child.is_file and not dirs:
+                    yield child.size, rel_path, child
+
+    return heapq.nlargest(count, candidates(), key=lambda item: item[0])
+
+
+def format_size(size):
+    """Tamanho legível em unidades de 1024 (ex.: `"1.5 MB"`)."""
+
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB", "TB"):
+        size /= 1024
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
+
+
+def iter_largest_lines(root_path, count, dirs=False, tree=None, stats=None,
+                       is_cancelled=None, ignore_files=None, ignore_folders=None,
+                       ignore_extensions=None, always_include=None, ignore_patterns=None,
+                       use_ignore_files=False):
+    """
+    ### Linhas da visão "maiores primeiro": tamanho alinhado e caminho.
+
+    - Agrega o modelo (`tree` ou um novo) antes de listar
+    - Filtros como em `largest_entries`
+    """
+
+    if tree is None:
+        tree = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+    aggregate_sizes(tree, stats, is_cancelled, ignore_folders)
+    for size, rel_path, entry in largest_entries(tree, count, dirs, ignore_files, ignore_folders,
+                                                 ignore_extensions, always_include,
+                                                 ignore_patterns, use_ignore_files):
+        suffix = "/" if entry.is_dir else ""
+        yield f"{format_size(size):>10}  {rel_path}{suffix}\n"
+
+
+def find_entry(tree, path):
+    """
+    ### Localiza no modelo o `Entry` correspondente a `path`.
+
+    - Retorna `None` se o caminho estiver fora do root ou não existir no modelo
+    """
+
+    rel_path = os.path.relpath(path, tree.path)
+    if rel_path == os.curdir:
+        return tree
+    node = tree
+    for part in rel_path.split(os.sep):
+        if part == os.pardir or not node.children:
+            return None
+        node = next((child for child in node.children if child.name == part), None)
+        if node is None:
+            return None
+    return node
+
+
+def refresh_entry(node, stats=None):
+    """
+    ### Relê apenas um diretório do modelo.
+
+    - Entradas que continuam existindo com o mesmo tipo mantêm o `Entry` (e a
+      subárvore) que já estava em memória
+    - Pastas novas ficam sem ler (`children = None`) e são lidas sob demanda
+      na próxima renderização; as que sumiram são descartadas
+    - A lista `children` é trocada de uma vez, então quem estiver renderizando
+      o modelo em outra thread continua vendo uma lista consistente
+    - Retorna `(pastas_adicionadas, pastas_removidas)`
+    """
+
+    try:
+        fresh = list_entries(node.path, stats)
+    except (PermissionError, FileNotFoundError) as error:
+        if stats is not None:
+            stats.record_error(error)
+        fresh = []
+        node.listed_mtime_ns = None
+
+    previous = {child.name: child for child in node.children or []}
+    children = []
+    added_dirs = []
+    removed_dirs = []
+    for entry in fresh:
+        old = previous.pop(entry.name, None)
+        if old is not None and old.is_dir == entry.is_dir and old.is_file == entry.is_file:
+            children.append(old)
+            continue
+        if old is not None and old.is_dir:
+            removed_dirs.append(old)
+        if entry.is_dir:
+            added_dirs.append(entry)
+        children.append(entry)
+    removed_dirs.extend(child for child in previous.values() if child.is_dir)
+
+    node.children = children
+    return added_dirs, removed_dirs
+
+
+def iter_dir_entries(node):
+    """Gera `node` e os diretórios abaixo dele que já foram lidos no modelo."""
+
+    if node.children is None:
+        return
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(child for child in current.children
+                     if child.is_dir and child.children is not None)
 
 
 def sort_entries(entries, root_path, sort_key):
     """
     ### Função auxiliar para ordenar as entradas com base na chave fornecida.
-    
+
     - Mapeia a chave para uma tupla de ordenação (tipo, nome)
     - O primeiro elemento da tupla define a ordem primária (arquivo vs. diretório)
     - O segundo elemento define a ordem secundária (nome)
+    - Aceita nomes (consulta o disco) ou objetos `Entry` (usa o tipo em cache)
+    - `size_*`/`mtime_*` ordenam por tamanho ou data (pastas pelos totais de
+      `aggregate_sizes`), com pastas e arquivos misturados e o nome como
+      desempate; entradas sem tamanho contam como zero
     """
 
+    if sort_key in SIZE_SORT_KEYS:
+        attribute = "size" if sort_key.startswith("size") else "mtime"
+        descending = sort_key.endswith("_desc")
+
+        def get_value_key(entry):
+            value = getattr(entry, attribute, None) or 0
+            return (-value if descending else value, entry.name.lower())
+
+        entries.sort(key=get_value_key)
+        return entries
+
     is_dir_first = "dirs_first" in sort_key
     is_reverse = "_za" in sort_key
 
     def get_sort_key(entry):
-        full_path = os.path.join(root_path, entry)
-        is_dir = os.path.isdir(full_path)
-        
+        if isinstance(entry, Entry):
+            is_dir = entry.is_dir
+            name = entry.name
+        else:
+            is_dir = os.path.isdir(os.path.join(root_path, entry))
+            name = entry
+
         # priorizar dir ou arquivos
         if is_dir_first:
             # Dir. primeiro: (False, nome) para dir, (True, nome) para arquivos
@@ -24,13 +932,386 @@ def sort_entries(entries, root_path, sort_key):
         else:
             # Arquivos primeiro: (False, nome) para arquivos, (True, nome) para dir
             type_order = is_dir
-            
-        return (type_order, entry.lower())
+
+        return (type_order, name.lower())
 
     entries.sort(key=get_sort_key, reverse=is_reverse)
     return entries
 
 
+def filter_entries(entries, ignore_files, ignore_folders, ignore_extensions, always_include):
+    """
+    ### Aplica as regras de exclusão sobre entradas já classificadas.
+
+    - Atalho para `EntryFilter` (ver `ignore_rules`); dentro da travessia o
+      filtro é compilado uma única vez
+    """
+
+    return EntryFilter(ignore_files, ignore_folders,
+                       ignore_extensions, always_include).filter(entries)
+
+
+def _separator_index(entries):
+    """
+    ### Posição da linha de separação entre pastas e arquivos no root.
+
+    - Só existe se houver pastas e arquivos e as pastas vierem logo antes
+    - Retorna -1 quando não há separador
+    """
+
+    last_folder_index = -1
+    first_file_index = -1
+
+    for i, entry in enumerate(entries):
+        if entry.is_dir:
+            last_folder_index = i
+        elif first_file_index == -1:
+            first_file_index = i
+
+    # Linha apenas se houver ambos e estiverem em sequencia
+    if last_folder_index != -1 and first_file_index != -1 and last_folder_index == first_file_index - 1:
+        return first_file_index
+    return -1
+
+
+def iter_tree_entries(root_path,
+                      ignore_files=None,
+                      ignore_folders=None,
+                      ignore_extensions=None,
+                      always_include=None,
+                      root_sort_key="dirs_first_az",
+                      subdir_sort_key="dirs_first_az",
+                      prefix="",
+                      is_root=False,
+                      stats=None,
+                      tree=None,
+                      is_cancelled=None,
+                      max_depth=None,
+                      max_entries_per_dir=None,
+                      ignore_patterns=None,
+                      use_ignore_files=False,
+                      symlinks="follow",
+                      workers=None,
+                      sizes=False,
+                      source="disk",
+                      untracked=False,
+                      unread=None):
+    """
+    ### Percorre a árvore em profundidade sem recursão.
+
+    - Gera tuplas `(depth, prefix, is_last, entry)` na ordem de exibição
+    - `entry` é `None` na linha de separação entre pastas e arquivos do root
+    - `max_depth` limita os níveis exibidos (1 = só o conteúdo do root); pastas
+      no último nível aparecem, mas não são abertas
+    - `max_entries_per_dir` corta cada diretório depois de filtrar e ordenar; o
+      restante vira um único `Overflow` com a contagem de arquivos e pastas, e
+      as pastas cortadas nunca são abertas
+    - `ignore_*` e `always_include` aceitam nomes exatos ou globs (`*.egg-info`,
+      `build/**`); `ignore_patterns` recebe linhas no formato `.gitignore`
+      (com `!`, `**` e "/" final) válidas a partir do root
+    - `use_ignore_files` lê o `.dockerignore` do root e o `.gitignore` de cada
+      diretório visitado; regras mais profundas têm precedência
+    - Pastas ignoradas são descartadas antes de serem abertas
+    - `symlinks` define o que fazer com links simbólicos:
+      `"follow"` segue todos; `"no_follow"` não abre links para pastas;
+      `"follow_once"` segue links, mas não os que estão dentro de um link já
+      seguido; `"follow_mark"` segue e anota o destino (`nome -> destino`).
+      Nas políticas que anotam, links não seguidos também mostram o destino
+    - Em todas as políticas, as repetições são detectadas pela identidade
+      `(st_dev, st_ino)`: um link para um ancestral vira uma linha `[cycle]`
+      e um diretório já listado (link ou bind mount) vira `[seen]`,
+      apontando para a ocorrência que mostra o conteúdo. O caminho real tem
+      precedência: um link para uma pasta do mesmo nível vira `[seen]` mesmo
+      que venha antes dela, e uma pasta aberta antes por um link ainda é
+      aberta no seu caminho real (os demais links para ela viram `[seen]`)
+    - Usa uma pilha explícita, então árvores profundas não estouram o limite
+      de recursão do Python
+    - Cada diretório só é lido quando o gerador chega nele
+    - Com `tree` (um `Entry` de diretório, ex.: resultado de `scan_tree`) o
+      modelo em memória é usado como cache: diretórios já lidos não voltam ao
+      disco, e os que ainda não foram lidos (`children is None`) são lidos e
+      guardados no modelo. Filtro e ordenação rodam sobre a memória (exceto
+      os arquivos de regras, com `use_ignore_files`)
+    - `is_cancelled` é consultado a cada diretório aberto (ver `scan_tree`)
+    - Com `workers` maior que 1, as subpastas que serão abertas são lidas
+      antecipadamente por um `Prefetcher` com esse número de threads (útil em
+      sistemas de arquivos de rede e FUSE); a saída é idêntica à sequencial
+    - `sizes=True` (ou uma chave `size_*`/`mtime_*`) agrega tamanhos com
+      `aggregate_sizes` antes de percorrer; sem `tree`, um modelo novo é
+      criado para isso. `format_line` mostra os totais das pastas
+    - `source="git"` monta o modelo a partir do `.git/index` (só arquivos
+      rastreados, sem listar o disco; ver `git_index`) quando `tree` não é
+      informado; `untracked=True` acrescenta os não rastreados que o
+      `.gitignore` não exclui. Filtros e ordenação valem normalmente
+    - `unread` (`"pending"` ou `"truncated"`, só com `tree`) desenha as pastas
+      ainda não lidas do modelo como `nome/ [pending]` (ou `[truncated]`) em
+      vez de lê-las: é assim que as árvores parciais de
+      `scan_breadth_first` são desenhadas
+    """
+
+    if symlinks not in SYMLINK_POLICIES:
+        raise ValueError(f"symlinks deve ser um de {SYMLINK_POLICIES}: {symlinks!r}")
+    if source not in SOURCES:
+        raise ValueError(f"source deve ser um de {SOURCES}: {source!r}")
+    if source == "git" and tree is None:
+        # Importado aqui: `git_index` depende deste módulo
+        from git_index import load_git_tree
+
+        tree = load_git_tree(root_path, untracked, stats, is_cancelled)
+    prefetcher = Prefetcher(workers, stats is not None) if workers and workers > 1 else None
+    try:
+        yield from _walk_tree(root_path, ignore_files, ignore_folders, ignore_extensions,
+                              always_include, root_sort_key, subdir_sort_key, prefix,
+                              is_root, stats, tree, is_cancelled, max_depth,
+                              max_entries_per_dir, ignore_patterns, use_ignore_files,
+                              symlinks, prefetcher, sizes, unread)
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+
+def _walk_tree(root_path, ignore_files, ignore_folders, ignore_extensions,
+               always_include, root_sort_key, subdir_sort_key, prefix, is_root,
+               stats, tree, is_cancelled, max_depth, max_entries_per_dir,
+               ignore_patterns, use_ignore_files, symlinks, prefetcher, sizes, unread):
+    """Corpo de `iter_tree_entries`, que cuida de encerrar o `prefetcher`."""
+
+    entry_filter = EntryFilter(ignore_files, ignore_folders,
+                               ignore_extensions, always_include)
+
+    with_sizes = sizes or root_sort_key in SIZE_SORT_KEYS or subdir_sort_key in SIZE_SORT_KEYS
+    if with_sizes:
+        if tree is None:
+            tree = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+        aggregate_sizes(tree, stats, is_cancelled, ignore_folders)
+
+    if tree is not None:
+        root = tree
+
+        def read(entry):
+            # Modelo preguiçoso: o que ainda não foi lido é lido agora e guardado
+            if entry.children is None and with_sizes:
+                # Só acontece com pastas repetidas que o percurso abre em outra
+                # ocorrência: a subárvore é agregada agora
+                aggregate_sizes(entry, stats, is_cancelled, ignore_folders)
+            elif entry.children is None:
+                entry.children = []
+                if prefetcher is not None:
+                    entry.children = prefetcher.take(entry, stats)
+                else:
+                    entry.children = list_entries(entry.path, stats)
+            return entry.children
+    else:
+        root = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+
+        def read(entry):
+            if prefetcher is not None:
+                return prefetcher.take(entry, stats)
+            return list_entries(entry.path, stats)
+
+    root_matchers = root_rule_matchers(root.path, ignore_patterns, use_ignore_files)
+
+    def will_open(entry, depth, in_link):
+        # Mesmo critério do laço abaixo, antes do teste de identidade
+        if not entry.is_dir or (max_depth is not None and depth + 1 >= max_depth):
+            return False
+        if entry.is_link and (symlinks == "no_follow" or (symlinks == "follow_once" and in_link)):
+            return False
+        return tree is None or entry.children is None
+
+    # Identidade -> caminho relativo da ocorrência que mostra o conteúdo. Em
+    # `visited` ficam os caminhos reais; em `link_visited`, os alcançados por
+    # um link seguido, que não impedem o caminho real de ser aberto depois.
+    # `ancestors` são os diretórios abertos no caminho atual
+    visited = {}
+    link_visited = {}
+
+    def claim(entries, rel_dir, depth):
+        # As pastas reais de um nível são registradas antes de qualquer link
+        # desse nível ser aberto: um link que vem antes do destino na ordem
+        # vira `[seen]` em vez de tomar o lugar da pasta real
+        for child in entries:
+            if (isinstance(child, Overflow) or not child.is_dir or child.is_link
+                    or (max_depth is not None and depth + 1 >= max_depth)):
+                continue
+            identity = entry_identity(child, stats)
+            if identity is not None and identity not in visited:
+                visited[identity] = f"{rel_dir}/{child.name}" if rel_dir else child.name
+
+    def children(entry, sort_key, rel_dir, matchers, depth=0, in_link=False):
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(root_path)
+        try:
+            entries = read(entry)
+        except (PermissionError, FileNotFoundError) as error:
+            if stats is not None:
+                stats.record_error(error)
+            entry.listed_mtime_ns = None
+            return [], matchers
+        if stats is not None:
+            started = perf_counter()
+        if use_ignore_files:
+            matchers = with_gitignore(matchers, entry, entries, rel_dir)
+        listed_count = len(entries)
+        entries = entry_filter.filter(entries, rel_dir, matchers)
+        if stats is not None:
+            stats.entries_filtered += listed_count - len(entries)
+            filtered = perf_counter()
+            stats.add_time("filter", filtered - started)
+        entries = sort_entries(entries, entry.path, sort_key)
+        if stats is not None:
+            stats.add_time("sort", perf_counter() - filtered)
+        if max_entries_per_dir is not None and len(entries) > max_entries_per_dir:
+            hidden = entries[max_entries_per_dir:]
+            hidden_dirs = sum(1 for hidden_entry in hidden if hidden_entry.is_dir)
+            entries = entries[:max_entries_per_dir]
+            entries.append(Overflow(len(hidden) - hidden_dirs, hidden_dirs))
+        if not in_link:
+            claim(entries, rel_dir, depth)
+        if prefetcher is not None:
+            prefetcher.schedule([child for child in entries
+                                 if not isinstance(child, Overflow)
+                                 and will_open(child, depth, in_link)])
+        return entries, matchers
+
+    # Antes de listar o root: `listed_mtime_ns` precisa ser anterior à listagem
+    root_identity = entry_identity(root, stats)
+    if root_identity is not None:
+        visited[root_identity] = "."
+    root_entries, root_matchers = children(
+        root, root_sort_key if is_root else subdir_sort_key, "", root_matchers)
+    if is_root:
+        separator_pos = _separator_index(
+            [entry for entry in root_entries if not isinstance(entry, Overflow)])
+    else:
+        separator_pos = -1
+
+    mark_links = symlinks != "follow"
+
+    ancestors = {root_identity}
+
+    # Cada quadro da pilha: (entradas, próxima posição, prefixo, profundidade,
+    # caminho relativo do diretório, regras em vigor para as entradas,
+    # identidade do diretório, se está dentro de um link seguido)
+    stack = [(root_entries, 0, prefix, 0, "", root_matchers, root_identity, False)]
+    while stack:
+        entries, i, current_prefix, depth, rel_dir, matchers, identity, in_link = stack[-1]
+        if i == len(entries):
+            stack.pop()
+            ancestors.discard(identity)
+            continue
+        stack[-1] = (entries, i + 1, current_prefix, depth, rel_dir, matchers, identity, in_link)
+
+        if depth == 0 and i == separator_pos:
+            yield depth, current_prefix, False, None
+
+        entry = entries[i]
+        is_last = i == len(entries) - 1
+        shown = entry
+        expand = entry.is_dir and (max_depth is None or depth + 1 < max_depth)
+        child_rel_dir = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        child_identity = None
+
+        if getattr(entry, "is_link", False) and (
+                symlinks == "no_follow" or (symlinks == "follow_once" and in_link)):
+            expand = False
+        if expand:
+            if prefetcher is not None:
+                # A tarefa também calcula a identidade: espera por ela em vez
+                # de repetir o stat aqui
+                prefetcher.wait(entry, stats)
+            child_identity = entry_identity(entry, stats)
+            if child_identity is not None:
+                first = visited.get(child_identity)
+                if first is None and (in_link or entry.is_link):
+                    first = link_visited.get(child_identity)
+                if child_identity in ancestors:
+                    shown = Reference(entry, "cycle",
+                                      visited.get(child_identity) or link_visited[child_identity])
+                    expand = False
+                elif first is not None and first != child_rel_dir:
+                    shown = Reference(entry, "seen", first)
+                    expand = False
+            if expand and unread is not None and tree is not None and entry.children is None:
+                # Árvore parcial: a pasta fica marcada em vez de ser lida agora
+                shown = Reference(entry, unread, None)
+                expand = False
+            if not expand and prefetcher is not None:
+                prefetcher.discard(entry)
+        if shown is entry and mark_links and getattr(entry, "is_link", False):
+            shown = Reference(entry, "link", _link_target(entry))
+
+        yield depth, current_prefix, is_last, shown
+
+        if expand:
+            if child_identity is not None:
+                if in_link or entry.is_link:
+                    link_visited.setdefault(child_identity, child_rel_dir)
+                else:
+                    visited[child_identity] = child_rel_dir
+                ancestors.add(child_identity)
+            extension_prefix = "    " if is_last else "│   "
+            child_entries, child_matchers = children(
+                entry, subdir_sort_key, child_rel_dir, matchers,
+                depth + 1, in_link or entry.is_link)
+            stack.append((child_entries, 0, current_prefix + extension_prefix,
+                          depth + 1, child_rel_dir, child_matchers, child_identity,
+                          in_link or entry.is_link))
+
+
+def iter_tree_lines(root_path, **kwargs):
+    """
+    ### Gera as linhas da árvore sob demanda.
+
+    - Aceita os mesmos parâmetros de `draw_tree`
+    - Cada linha já vem com o "\\n" final
+    - Com `stats`, o tempo de formatação entra na fase `render`
+    - Com `index` (um `search_index.SearchIndex`), cada entrada desenhada
+      também é indexada para a busca
+    """
+
+    index = kwargs.pop("index", None)
+    stats = kwargs.get("stats")
+    sizes = kwargs.get("sizes", False)
+    for depth, prefix, is_last, entry in iter_tree_entries(root_path, **kwargs):
+        if index is not None:
+            index.add(depth, entry)
+        if stats is None:
+            yield format_line(prefix, is_last, entry, sizes)
+            continue
+        started = perf_counter()
+        line = format_line(prefix, is_last, entry, sizes)
+        stats.add_time("render", perf_counter() - started)
+        yield line
+
+
+def format_line(prefix, is_last, entry, sizes=False):
+    """
+    ### Formata um item de `iter_tree_entries` como linha da árvore.
+
+    - Com `sizes`, pastas ganham `(tamanho, N arquivos)` e arquivos o tamanho
+    """
+
+    if entry is None:
+        return "│\n"
+    connector = "└── " if is_last else "├── "
+    display_name = entry.name + "/" if entry.is_dir else entry.name
+    if isinstance(entry, Reference):
+        display_name += entry.suffix
+    elif sizes and getattr(entry, "size", None) is not None:
+        if entry.is_dir:
+            display_name += f" ({format_size(entry.size)}, {entry.file_count} arquivos)"
+        elif entry.is_file:
+            display_name += f" ({format_size(entry.size)})"
+    return f"{prefix}{connector}{display_name}\n"
+
+
+def tree_header(root_path):
+    """Primeira linha da saída: o nome do root seguido de "/"."""
+
+    return f"{os.path.basename(os.path.normpath(root_path))}/\n"
+
+
 def draw_tree(root_path,
               ignore_files=None,
               ignore_folders=None,
@@ -39,81 +1320,45 @@ def draw_tree(root_path,
               root_sort_key="dirs_first_az", # Ex: "files_first_za"
               subdir_sort_key="dirs_first_az", # Ex: "dirs_first_az"
               prefix="",
-              is_root=False):
-    
-    ignore_files = set(ignore_files or [])
-    ignore_folders = set(ignore_folders or [])
-    ignore_extensions = set(ignore_extensions or [])
-    always_include = set(always_include or [])
-
-    try:
-        entries = os.listdir(root_path)
-    except (PermissionError, FileNotFoundError):
-        return ""
-
-    # Filtra as entradas
-    entries_filtered = []
-    for entry in entries:
-        full_path = os.path.join(root_path, entry)
-        if entry.startswith(".") and entry not in always_include:
-            continue
-        if os.path.isdir(full_path) and entry in ignore_folders:
-            continue
-        if os.path.isfile(full_path):
-            _name, ext = os.path.splitext(entry)
-            if entry in ignore_files and entry not in always_include:
-                continue
-            if ext in ignore_extensions and entry not in always_include:
-                continue
-        entries_filtered.append(entry)
-
-    # Ordena com base no nivel (root ou subdir)
-    current_sort_key = root_sort_key if is_root else subdir_sort_key
-    entries_filtered = sort_entries(entries_filtered, root_path, current_sort_key)
-
-    # Gera a string da árvore
-    tree_str = ""
-    entries_count = len(entries_filtered)
-    
-    # Logica para linha de separacao entre pastas e arquivos no root
-    if is_root:
-        last_folder_index = -1
-        first_file_index = -1
-        
-        for i, entry in enumerate(entries_filtered):
-            if os.path.isdir(os.path.join(root_path, entry)):
-                last_folder_index = i
-            elif first_file_index == -1:
-                first_file_index = i
-        
-        # Linha apenas se houver ambos e estiverem em sequencia
-        if last_folder_index != -1 and first_file_index != -1 and last_folder_index == first_file_index - 1:
-            separator_pos = first_file_index
-        else:
-            separator_pos = -1
-            
-    for i, entry in enumerate(entries_filtered):
-        if is_root and i == separator_pos:
-             tree_str += "│\n"
-
-        full_path = os.path.join(root_path, entry)
-        connector = "└── " if i == entries_count - 1 else "├── "
-        display_name = entry + "/" if os.path.isdir(full_path) else entry
-
-        tree_str += f"{prefix}{connector}{display_name}\n"
-
-        if os.path.isdir(full_path):
-            extension_prefix = "    " if i == entries_count - 1 else "│   "
-            tree_str += draw_tree(
-                full_path,
-                ignore_files=ignore_files,
-                ignore_folders=ignore_folders,
-                ignore_extensions=ignore_extensions,
-                always_include=always_include,
-                root_sort_key=root_sort_key,
-                subdir_sort_key=subdir_sort_key,
-                prefix=prefix + extension_prefix,
-                is_root=False
-            )
+              is_root=False,
+              stats=None,
+              tree=None,
+              is_cancelled=None,
+              max_depth=None,
+              max_entries_per_dir=None,
+              ignore_patterns=None,
+              use_ignore_files=False,
+              symlinks="follow",
+              workers=None,
+              sizes=False,
+              source="disk",
+              untracked=False,
+              unread=None):
 
+    tree_str = "".join(iter_tree_lines(
+        root_path,
+        ignore_files=ignore_files,
+        ignore_folders=ignore_folders,
+        ignore_extensions=ignore_extensions,
+        always_include=always_include,
+        root_sort_key=root_sort_key,
+        subdir_sort_key=subdir_sort_key,
+        prefix=prefix,
+        is_root=is_root,
+        stats=stats,
+        tree=tree,
+        is_cancelled=is_cancelled,
+        max_depth=max_depth,
+        max_entries_per_dir=max_entries_per_dir,
+        ignore_patterns=ignore_patterns,
+        use_ignore_files=use_ignore_files,
+        symlinks=symlinks,
+        workers=workers,
+        sizes=sizes,
+        source=source,
+        untracked=untracked,
+        unread=unread
+    ))
+    if stats is not None:
+        stats.finish()
     return tree_str
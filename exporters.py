@@ -0,0 +1,260 @@
+"""
+### Exportação da árvore em outros formatos.
+
+- Formatos: `text` (o mesmo texto da interface), `json` (aninhado),
+  `ndjson` (um registro por entrada), `markdown` (lista) e `html`
+  (`<details>` recolhíveis)
+- Tudo é escrito direto no arquivo conforme a árvore é percorrida: a memória
+  usada não depende do tamanho da árvore, só da profundidade
+- Aceita os mesmos parâmetros de `draw_tree`
+"""
+
+import html
+import json
+import os
+
+from draw_structure_logic import (Overflow, Reference, iter_tree_entries,
+                                  iter_tree_lines, tree_header)
+
+EXPORT_FORMATS = ("text", "json", "ndjson", "markdown", "html")
+
+# Extensão sugerida para cada formato
+EXPORT_EXTENSIONS = {
+    "text": ".txt",
+    "json": ".json",
+    "ndjson": ".ndjson",
+    "markdown": ".md",
+    "html": ".html",
+}
+
+
+def iter_tree_events(root_path, **kwargs):
+    """
+    ### Percorre a árvore como eventos de abertura e fechamento de pastas.
+
+    - Gera `(evento, profundidade, caminho_relativo, entry)`, com `evento` em
+      `"leaf"` (entrada sem filhos listados), `"open"` (pasta cujos filhos
+      vêm a seguir) e `"close"` (fim dos filhos da pasta aberta)
+    - A profundidade começa em 1 para o conteúdo do root, como `max_depth`
+    - Olha uma entrada à frente para saber se uma pasta tem filhos; a linha de
+      separação do root não gera evento
+    """
+
+    parts = []
+    pending = None
+    opened = []
+    for depth, _prefix, _is_last, entry in iter_tree_entries(root_path, **kwargs):
+        if entry is None:
+            continue
+        depth += 1
+        del parts[depth - 1:]
+        parts.append(entry.name)
+        if pending is not None:
+            if depth > pending[0]:
+                yield ("open",) + pending
+                opened.append(pending)
+            else:
+                yield ("leaf",) + pending
+        while opened and opened[-1][0] >= depth:
+            yield ("close",) + opened.pop()
+        pending = (depth, "/".join(parts), entry)
+    if pending is not None:
+        yield ("leaf",) + pending
+    while opened:
+        yield ("close",) + opened.pop()
+
+
+def entry_type(entry):
+    if isinstance(entry, Overflow):
+        return "overflow"
+    if entry.is_dir:
+        return "dir"
+    if entry.is_file:
+        return "file"
+    return "other"
+
+
+def entry_record(depth, rel_path, entry):
+    """Dicionário de uma entrada, usado pelo JSON e pelo NDJSON."""
+
+    record = {"path": rel_path, "name": entry.name, "depth": depth, "type": entry_type(entry)}
+    if isinstance(entry, Overflow):
+        record["path"] = rel_path.rpartition("/")[0]
+        record["files"] = entry.files
+        record["dirs"] = entry.dirs
+    elif isinstance(entry, Reference):
+        record["ref"] = entry.kind
+        record["target"] = entry.target
+    elif entry.size is not None:
+        # Só com `sizes=True` ou ordenação por tamanho/data
+        record["size"] = entry.size
+        record["mtime"] = entry.mtime
+        if entry.is_dir:
+            record["files"] = entry.file_count
+    return record
+
+
+def _dumps(record):
+    # `ensure_ascii=False` + surrogateescape no arquivo preserva nomes que não
+    # são UTF-8 válido
+    return json.dumps(record, ensure_ascii=False)
+
+
+def export_text(root_path, handle, **kwargs):
+    handle.write(tree_header(root_path))
+    count = 0
+    for line in iter_tree_lines(root_path, **kwargs):
+        handle.write(line)
+        count += 1
+    return count
+
+
+def export_ndjson(root_path, handle, **kwargs):
+    count = 0
+    for event, depth, rel_path, entry in iter_tree_events(root_path, **kwargs):
+        if event == "close":
+            continue
+        handle.write(_dumps(entry_record(depth, rel_path, entry)) + "\n")
+        count += 1
+    return count
+
+
+def export_json(root_path, handle, **kwargs):
+    """
+    ### Um único objeto: `{"name", "type", "children": [...]}`.
+
+    - Cada pasta com filhos listados ganha `children`; pastas vazias ou não
+      abertas (limites, referências) não têm a chave
+    """
+
+    root_name = os.path.basename(os.path.normpath(root_path))
+    handle.write(_dumps({"path": "", "name": root_name, "depth": 0, "type": "dir"})[:-1]
+                 + ', "children": [')
+    # Um valor por nível aberto: se o próximo item precisa de vírgula
+    need_comma = [False]
+    count = 0
+    for event, depth, rel_path, entry in iter_tree_events(root_path, **kwargs):
+        if event == "close":
+            handle.write("]}")
+            need_comma.pop()
+            continue
+        text = _dumps(entry_record(depth, rel_path, entry))
+        if event == "open":
+            text = text[:-1] + ', "children": ['
+        handle.write((",\n" if need_comma[-1] else "\n") + text)
+        need_comma[-1] = True
+        if event == "open":
+            need_comma.append(False)
+        count += 1
+    handle.write("]}\n")
+    return count
+
+
+class _RootName:
+    # O root no formato de um `Entry`, para os cabeçalhos
+    is_dir = True
+
+    def __init__(self, root_path):
+        self.name = os.path.basename(os.path.normpath(root_path))
+
+
+MARKDOWN_SPECIAL = "\\`*_[]<#"
+
+
+def _markdown_name(entry):
+    name = entry.name + "/" if entry.is_dir else entry.name
+    if isinstance(entry, Reference):
+        name += entry.suffix
+    return "".join("\\" + char if char in MARKDOWN_SPECIAL else char for char in name)
+
+
+def export_markdown(root_path, handle, **kwargs):
+    handle.write(f"- {_markdown_name(_RootName(root_path))}\n")
+    count = 0
+    for event, depth, _rel_path, entry in iter_tree_events(root_path, **kwargs):
+        if event == "close":
+            continue
+        handle.write(f"{'  ' * depth}- {_markdown_name(entry)}\n")
+        count += 1
+    return count
+
+
+HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+ul.dirtree, ul.dirtree ul {{ list-style: none; padding-left: 1.2em; font-family: monospace; }}
+ul.dirtree summary {{ cursor: pointer; }}
+</style>
+</head>
+<body>
+<ul class="dirtree">
+<li><details open><summary>{title}</summary><ul>
+"""
+
+HTML_TAIL = """</ul></details></li>
+</ul>
+</body>
+</html>
+"""
+
+
+def _html_name(entry):
+    name = entry.name + "/" if entry.is_dir else entry.name
+    if isinstance(entry, Reference):
+        name += entry.suffix
+    return html.escape(name)
+
+
+def export_html(root_path, handle, **kwargs):
+    handle.write(HTML_HEAD.format(title=_html_name(_RootName(root_path))))
+    count = 0
+    for event, depth, _rel_path, entry in iter_tree_events(root_path, **kwargs):
+        indent = "  " * depth
+        if event == "close":
+            handle.write(f"{indent}</ul></details></li>\n")
+            continue
+        if event == "open":
+            handle.write(f"{indent}<li><details><summary>{_html_name(entry)}</summary><ul>\n")
+        else:
+            handle.write(f"{indent}<li>{_html_name(entry)}</li>\n")
+        count += 1
+    handle.write(HTML_TAIL)
+    return count
+
+
+EXPORTERS = {
+    "text": export_text,
+    "json": export_json,
+    "ndjson": export_ndjson,
+    "markdown": export_markdown,
+    "html": export_html,
+}
+
+
+def export_tree(root_path, handle, fmt="text", **kwargs):
+    """
+    ### Escreve a árvore de `root_path` em `handle` no formato `fmt`.
+
+    - `handle` é um arquivo de texto aberto para escrita (ex.: `open(...,
+      "w", encoding="utf-8", errors="surrogateescape", newline="\\n")`)
+    - `kwargs` são os parâmetros de `draw_tree`; com `stats`, `finish()` é
+      chamado ao final
+    - Retorna quantas entradas foram escritas
+    """
+
+    if fmt not in EXPORTERS:
+        raise ValueError(f"formato deve ser um de {EXPORT_FORMATS}: {fmt!r}")
+    count = EXPORTERS[fmt](root_path, handle, **kwargs)
+    stats = kwargs.get("stats")
+    if stats is not None:
+        stats.finish()
+    return count
+
+
+def open_export_file(path):
+    """Abre `path` para `export_tree` com a codificação usada pelo DirTree."""
+
+    return open(path, "w", encoding="utf-8", errors="surrogateescape", newline="\n")
@@ -0,0 +1,363 @@
+"""
+### Árvore a partir do índice do git (`.git/index`), sem o executável `git`.
+
+- Lê as versões 2, 3 e 4 do formato `DIRC` (a 4 comprime os caminhos pelo
+  prefixo do anterior), com hashes SHA-1 ou SHA-256
+- O modelo sai completo (`children` preenchido em todas as pastas), então o
+  percurso de `draw_tree` não lista o disco: saída de build e outras pastas
+  não rastreadas nem são abertas
+- Funciona em subpastas do repositório (só os caminhos abaixo dela entram) e
+  em worktrees adicionais (`.git` como arquivo `gitdir: ...`)
+- Links simbólicos são arquivos para o git e aparecem como arquivos com
+  `is_link`; submódulos aparecem como pastas vazias
+- `untracked=True` lista o disco para acrescentar os arquivos não
+  rastreados, respeitando `.gitignore` e `.git/info/exclude` como o
+  `git status` (pastas ignoradas não são abertas)
+"""
+
+import os
+import re
+import struct
+import sys
+from time import perf_counter
+
+from draw_structure_logic import Entry, ScanCancelled, list_entries
+from ignore_rules import GITIGNORE_NAME, RuleMatcher, is_ignored
+
+INDEX_SIGNATURE = b"DIRC"
+INDEX_VERSIONS = (2, 3, 4)
+
+# assinatura, versão, número de entradas
+HEADER = struct.Struct(">4sII")
+UINT = struct.Struct(">I")
+USHORT = struct.Struct(">H")
+
+# ctime, mtime (segundos e nanos), dev, ino, mode, uid, gid e tamanho
+ENTRY_STAT_SIZE = 40
+MODE_OFFSET = 24
+
+FLAG_EXTENDED = 0x4000
+NAME_MASK = 0x0FFF
+
+MODE_TYPE_MASK = 0o170000
+MODE_LINK = 0o120000
+MODE_GITLINK = 0o160000
+# Pasta inteira fora do sparse-checkout (índice esparso)
+MODE_SPARSE_DIR = 0o040000
+
+# Mesmo que `os.fsdecode`, sem uma chamada por caminho
+FS_ENCODING = sys.getfilesystemencoding()
+FS_ERRORS = sys.getfilesystemencodeerrors()
+
+
+class GitIndexError(Exception):
+    """Repositório não encontrado ou índice ilegível."""
+
+
+def find_work_tree(path):
+    """
+    ### Sobe a partir de `path` até achar o `.git` do repositório.
+
+    - Retorna `(topo_da_worktree, diretório_git)`
+    - Levanta `GitIndexError` se `path` não estiver em um repositório
+    """
+
+    current = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            return current, _read_gitdir_file(dot_git)
+        parent = os.path.dirname(current)
+        if parent == current:
+            raise GitIndexError(f"não é um repositório git: {path}")
+        current = parent
+
+
+def _read_gitdir_file(dot_git):
+    # Worktrees adicionais e submódulos: ".git" é um arquivo "gitdir: <caminho>"
+    try:
+        with open(dot_git, encoding="utf-8", errors="surrogateescape") as handle:
+            line = handle.readline().strip()
+    except OSError as error:
+        raise GitIndexError(str(error)) from error
+    if not line.startswith("gitdir:"):
+        raise GitIndexError(f"arquivo .git inválido: {dot_git}")
+    git_dir = line[len("gitdir:"):].strip()
+    return os.path.join(os.path.dirname(dot_git), git_dir)
+
+
+def common_dir(git_dir):
+    """Diretório com `config` e `info/` (o principal, em worktrees adicionais)."""
+
+    try:
+        with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as handle:
+            return os.path.join(git_dir, handle.readline().strip())
+    except OSError:
+        return git_dir
+
+
+def hash_size(git_dir):
+    """20 bytes (SHA-1) ou 32 (repositórios com `objectformat = sha256`)."""
+
+    try:
+        with open(os.path.join(common_dir(git_dir), "config"), encoding="utf-8",
+                  errors="replace") as handle:
+            config = handle.read()
+    except OSError:
+        return 20
+    if re.search(r"^\s*objectformat\s*=\s*sha256\s*$", config, re.IGNORECASE | re.MULTILINE):
+        return 32
+    return 20
+
+
+def _read_varint(data, offset):
+    # Inteiro de tamanho variável da versão 4 (o mesmo dos offsets de packs)
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def read_index(index_path, digest_size=20):
+    """
+    ### Lê as entradas de um arquivo de índice.
+
+    - Retorna uma lista de `(caminho_em_bytes, mode)` na ordem do índice
+      (caminhos com "/", ordenados byte a byte)
+    - Entradas de conflito (estágios 1 a 3 do mesmo caminho) viram uma só
+    - Levanta `GitIndexError` se o arquivo não for um índice suportado
+    """
+
+    try:
+        with open(index_path, "rb") as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        # Repositório recém-criado, sem nenhum `git add`
+        return []
+    except OSError as error:
+        raise GitIndexError(str(error)) from error
+    try:
+        signature, version, count = HEADER.unpack_from(data, 0)
+    except struct.error as error:
+        raise GitIndexError("índice truncado") from error
+    if signature != INDEX_SIGNATURE or version not in INDEX_VERSIONS:
+        raise GitIndexError(f"formato de índice não suportado: {signature!r} v{version}")
+
+    unpack_uint = UINT.unpack_from
+    unpack_ushort = USHORT.unpack_from
+    flags_offset = ENTRY_STAT_SIZE + digest_size
+    entries = []
+    offset = HEADER.size
+    previous = b""
+    try:
+        for _ in range(count):
+            (mode,) = unpack_uint(data, offset + MODE_OFFSET)
+            (flags,) = unpack_ushort(data, offset + flags_offset)
+            name_at = offset + flags_offset + 2
+            if flags & FLAG_EXTENDED:
+                name_at += 2
+            if version == 4:
+                strip, name_at = _read_varint(data, name_at)
+                end = data.index(b"\0", name_at)
+                name = previous[:len(previous) - strip] + data[name_at:end]
+                offset = end + 1
+            else:
+                length = flags & NAME_MASK
+                end = data.index(b"\0", name_at) if length == NAME_MASK else name_at + length
+                name = data[name_at:end]
+                # Entradas completadas com 1 a 8 NULs até um múltiplo de 8
+                offset += (end - offset + 8) & ~7
+            if name != previous:
+                entries.append((name, mode))
+            previous = name
+        # Extensões: a "link" (índice dividido) guarda as entradas em outro arquivo
+        while offset + 8 <= len(data) - digest_size:
+            extension = data[offset:offset + 4]
+            if extension == b"link":
+                raise GitIndexError("índice dividido (core.splitIndex) não é suportado")
+            (size,) = unpack_uint(data, offset + 4)
+            offset += 8 + size
+    except (struct.error, ValueError, IndexError) as error:
+        raise GitIndexError("índice corrompido") from error
+    return entries
+
+
+def _child_path(parent, name):
+    # Mesmo resultado de `os.path.join(parent.path, name)`
+    if parent.path.endswith(os.sep):
+        return parent.path + name
+    return parent.path + os.sep + name
+
+
+def _git_dir_entry(name, path):
+    entry = Entry(name, path, True, False, children=[])
+    # Sem ciclos no índice: o caminho serve de identidade e evita um `stat`
+    # por pasta no percurso
+    entry.identity = ("git", path)
+    return entry
+
+
+def build_index_tree(root, entries, prefix=b""):
+    """
+    ### Preenche `root` com as entradas do índice abaixo de `prefix`.
+
+    - `prefix` é o caminho de `root` dentro da worktree, com "/" no fim (vazio
+      no topo); entradas fora dele são descartadas
+    - Pastas intermediárias são criadas conforme aparecem nos caminhos
+    - Retorna quantas entradas entraram no modelo
+    """
+
+    root.children = []
+    root.identity = ("git", root.path)
+    dirs = {b"": root}
+    prefix_length = len(prefix)
+    count = 0
+    for name, mode in entries:
+        if prefix_length:
+            if not name.startswith(prefix):
+                continue
+            name = name[prefix_length:]
+        kind = mode & MODE_TYPE_MASK
+        if kind == MODE_SPARSE_DIR:
+            name = name.rstrip(b"/")
+        parent_key, _slash, base = name.rpartition(b"/")
+        parent = dirs.get(parent_key)
+        if parent is None:
+            parent = _make_dirs(dirs, parent_key)
+        decoded = base.decode(FS_ENCODING, FS_ERRORS)
+        path = _child_path(parent, decoded)
+        if kind in (MODE_GITLINK, MODE_SPARSE_DIR):
+            entry = dirs.get(name)
+            if entry is None:
+                entry = _git_dir_entry(decoded, path)
+                dirs[name] = entry
+                parent.children.append(entry)
+        else:
+            entry = Entry(decoded, path, False, True, is_link=kind == MODE_LINK)
+            parent.children.append(entry)
+        count += 1
+    return count
+
+
+def _make_dirs(dirs, key):
+    # Cria as pastas que faltam de `key` (ex.: b"src/pkg"), da mais rasa à
+    # mais funda
+    parts = key.split(b"/")
+    parent = dirs[b""]
+    for i in range(len(parts)):
+        current = b"/".join(parts[:i + 1])
+        node = dirs.get(current)
+        if node is None:
+            name = parts[i].decode(FS_ENCODING, FS_ERRORS)
+            node = _git_dir_entry(name, _child_path(parent, name))
+            dirs[current] = node
+            parent.children.append(node)
+        parent = node
+    return parent
+
+
+def _root_matchers(top, git_dir, rel_root):
+    """Regras que valem no root: `info/exclude` e os `.gitignore` acima dele."""
+
+    matchers = []
+    matcher = RuleMatcher.from_file(os.path.join(common_dir(git_dir), "info", "exclude"))
+    if matcher is not None:
+        matchers.append(matcher)
+    parts = rel_root.split("/") if rel_root else []
+    for i in range(len(parts)):
+        base = "/".join(parts[:i])
+        matcher = RuleMatcher.from_file(os.path.join(top, *parts[:i], GITIGNORE_NAME), base)
+        if matcher is not None:
+            matchers.append(matcher)
+    return matchers
+
+
+def add_untracked(root, top, git_dir, rel_root="", stats=None, is_cancelled=None):
+    """
+    ### Acrescenta ao modelo do índice o que está no disco e não é rastreado.
+
+    - Caminhos das regras são relativos ao topo da worktree (`rel_root` é o
+      caminho do root dentro dela)
+    - Pastas rastreadas são listadas; não rastreadas entram se não forem
+      ignoradas, e o seu conteúdo também passa pelas regras. Pastas ignoradas
+      (rastreadas ou não) não são abertas, como no `git status`
+    - Outros repositórios dentro da worktree aparecem vazios
+    - Retorna quantas entradas foram acrescentadas
+    """
+
+    added = 0
+    stack = [(root, rel_root, _root_matchers(top, git_dir, rel_root), False)]
+    while stack:
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(root.path)
+        node, rel_dir, matchers, untracked = stack.pop()
+        try:
+            listed = list_entries(node.path, stats)
+        except (PermissionError, FileNotFoundError) as error:
+            if stats is not None:
+                stats.record_error(error)
+            continue
+        if untracked and any(entry.name == ".git" for entry in listed):
+            continue
+        if any(entry.name == GITIGNORE_NAME and entry.is_file for entry in listed):
+            matcher = RuleMatcher.from_file(os.path.join(node.path, GITIGNORE_NAME), rel_dir)
+            if matcher is not None:
+                matchers = matchers + [matcher]
+        tracked = {child.name: child for child in node.children}
+        for entry in listed:
+            if entry.name == ".git":
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            known = tracked.get(entry.name)
+            if known is not None:
+                # Pastas rastreadas vazias no modelo são submódulos ou pastas
+                # fora do sparse-checkout: não são abertas
+                if known.is_dir and known.children and not is_ignored(matchers, rel_path, True):
+                    stack.append((known, rel_path, matchers, False))
+                continue
+            if entry.is_link:
+                # Para o git, um link é um arquivo
+                entry.is_dir = False
+                entry.is_file = True
+            if is_ignored(matchers, rel_path, entry.is_dir):
+                continue
+            if entry.is_dir:
+                entry.children = []
+                entry.identity = ("git", entry.path)
+                stack.append((entry, rel_path, matchers, True))
+            node.children.append(entry)
+            added += 1
+    return added
+
+
+def load_git_tree(root_path, untracked=False, stats=None, is_cancelled=None):
+    """
+    ### Modelo completo de `root_path` a partir do índice do git.
+
+    - `root_path` pode ser o topo da worktree ou qualquer pasta dentro dela
+    - Com `untracked`, os não rastreados são acrescentados (`add_untracked`)
+    - Com `stats`, a leitura do índice entra na fase `index` e as entradas
+      do índice contam em `entries`
+    - Levanta `GitIndexError` fora de um repositório ou com índice ilegível
+    """
+
+    started = perf_counter()
+    top, git_dir = find_work_tree(root_path)
+    entries = read_index(os.path.join(git_dir, "index"), hash_size(git_dir))
+    rel_root = os.path.relpath(os.path.abspath(root_path), top)
+    rel_root = "" if rel_root == os.curdir else rel_root.replace(os.sep, "/")
+    prefix = os.fsencode(rel_root) + b"/" if rel_root else b""
+    root = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+    count = build_index_tree(root, entries, prefix)
+    if stats is not None:
+        stats.entries += count
+        stats.add_time("index", perf_counter() - started)
+    if untracked:
+        add_untracked(root, top, git_dir, rel_root, stats, is_cancelled)
+    return root
@@ -0,0 +1,264 @@
+import os
+import re
+
+GLOB_CHARS = "*?["
+
+# Arquivos de regras lidos com `use_ignore_files=True`
+GITIGNORE_NAME = ".gitignore"
+DOCKERIGNORE_NAME = ".dockerignore"
+
+
+def translate_glob(pattern):
+    """
+    ### Converte um glob em expressão regular (sem âncoras).
+
+    - `*` e `?` não atravessam "/"; `[...]` funciona como no `fnmatch`
+    - `**/` casa zero ou mais diretórios; `/**` no fim casa tudo o que estiver
+      dentro; `**` em outra posição vale como `*`
+    - `\\` escapa o caractere seguinte
+    """
+
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            if pattern.startswith("**", i):
+                end = i + 2
+                at_segment_start = i == 0 or pattern[i - 1] == "/"
+                if at_segment_start and end == n:
+                    out.append(".*")
+                    i = end
+                    continue
+                if at_segment_start and pattern[end] == "/":
+                    out.append("(?:.*/)?")
+                    i = end + 1
+                    continue
+                i = end
+            else:
+                i += 1
+            out.append("[^/]*")
+            continue
+        if char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = i + 1
+            if end < n and pattern[end] in "!^":
+                end += 1
+            if end < n and pattern[end] == "]":
+                end += 1
+            while end < n and pattern[end] != "]":
+                end += 1
+            if end >= n:
+                out.append("\\[")
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body[:1] in "!^":
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+
+def parse_rule(line, anchored=False):
+    """
+    ### Interpreta uma linha no formato do `.gitignore`.
+
+    - Retorna `(regex, negate, dir_only)` ou `None` para linhas vazias e
+      comentários
+    - `!` nega a regra; "/" no final restringe a diretórios
+    - Regras com "/" no início ou no meio valem a partir do diretório do
+      arquivo; as demais casam em qualquer nível abaixo dele
+    - `anchored=True` ancora todas as regras (semântica do `.dockerignore`)
+    """
+
+    line = line.rstrip("\r\n")
+    # Espaços finais só contam se escapados
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+
+    negate = False
+    if line.startswith("!"):
+        negate = True
+        line = line[1:]
+    elif line.startswith(("\\!", "\\#")):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    anchored = anchored or "/" in line
+    line = line.lstrip("/")
+
+    regex = translate_glob(line)
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return regex, negate, dir_only
+
+
+class RuleMatcher:
+    """
+    ### Regras de um nível (um `.gitignore` ou uma lista de padrões).
+
+    - Todas as regras viram uma única regex por tipo de entrada: uma para
+      pastas e outra para arquivos (que ignora as regras terminadas em "/")
+    - As alternativas ficam em ordem inversa, então a primeira que casa é a
+      última regra do arquivo, como no git
+    - `base` é o caminho relativo (com "/") do diretório dono das regras
+    """
+
+    def __init__(self, rules, base=""):
+        self.base = base
+        self._dir_regex, self._dir_negate = self._compile(rules)
+        self._file_regex, self._file_negate = self._compile(
+            [rule for rule in rules if not rule[2]])
+
+    @classmethod
+    def from_lines(cls, lines, base="", anchored=False):
+        rules = [rule for rule in (parse_rule(line, anchored) for line in lines) if rule]
+        return cls(rules, base) if rules else None
+
+    @classmethod
+    def from_file(cls, path, base="", anchored=False):
+        try:
+            with open(path, encoding="utf-8", errors="surrogateescape") as handle:
+                return cls.from_lines(handle, base, anchored)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return None, ()
+        parts = []
+        negates = []
+        for i, (regex, negate, _dir_only) in enumerate(reversed(rules)):
+            parts.append(f"(?P<r{i}>{regex})")
+            negates.append(negate)
+        return re.compile("(?:" + "|".join(parts) + r")\Z", re.DOTALL), negates
+
+    def match(self, rel_path, is_dir):
+        """
+        ### Decide sobre `rel_path` (relativo ao root, com "/").
+
+        - `True`: ignorado; `False`: reincluído por uma negação;
+          `None`: nenhuma regra deste nível se aplica
+        """
+
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        if is_dir:
+            regex, negates = self._dir_regex, self._dir_negate
+        else:
+            regex, negates = self._file_regex, self._file_negate
+        if regex is None:
+            return None
+        match = regex.match(rel_path)
+        if match is None:
+            return None
+        return not negates[int(match.lastgroup[1:])]
+
+
+class GlobSet:
+    """
+    ### Conjunto de nomes e globs compilado uma única vez.
+
+    - Nomes sem caracteres de glob continuam sendo uma busca em `set`
+    - Globs sem "/" casam com o nome; com "/" casam com o caminho relativo
+    """
+
+    def __init__(self, patterns):
+        patterns = list(patterns or [])
+        self.names = {pattern for pattern in patterns
+                      if not any(char in pattern for char in GLOB_CHARS) and "/" not in pattern}
+        name_globs = [pattern for pattern in patterns
+                      if pattern not in self.names and "/" not in pattern]
+        path_globs = [pattern.strip("/") for pattern in patterns if "/" in pattern]
+        self._name_regex = self._compile(name_globs)
+        self._path_regex = self._compile(path_globs)
+
+    @staticmethod
+    def _compile(globs):
+        if not globs:
+            return None
+        return re.compile(
+            "(?:" + "|".join(translate_glob(glob) for glob in globs) + r")\Z", re.DOTALL)
+
+    def __bool__(self):
+        return bool(self.names) or self._name_regex is not None or self._path_regex is not None
+
+    def match(self, name, rel_path=None):
+        if name in self.names:
+            return True
+        if self._name_regex is not None and self._name_regex.match(name):
+            return True
+        if self._path_regex is not None and rel_path is not None:
+            return self._path_regex.match(rel_path) is not None
+        return False
+
+
+class EntryFilter:
+    """
+    ### Regras de exclusão de `draw_tree`, compiladas uma única vez.
+
+    - Ocultos (iniciados por ".") só entram se casarem com `always_include`
+    - Pastas que casam com `ignore_folders` são sempre removidas
+    - Arquivos saem por `ignore_files` ou `ignore_extensions`, salvo se casarem
+      com `always_include`
+    - Por fim valem as regras no formato `.gitignore` (`matchers`, do nível mais
+      raso ao mais profundo), também anuladas por `always_include`
+    """
+
+    def __init__(self, ignore_files=None, ignore_folders=None,
+                 ignore_extensions=None, always_include=None):
+        self.ignore_files = GlobSet(ignore_files)
+        self.ignore_folders = GlobSet(ignore_folders)
+        self.ignore_extensions = GlobSet(ignore_extensions)
+        self.always_include = GlobSet(always_include)
+
+    def is_pruned_folder(self, name, rel_path):
+        return self.ignore_folders.match(name, rel_path)
+
+    def filter(self, entries, rel_dir="", matchers=()):
+        entries_filtered = []
+        for entry in entries:
+            name = entry.name
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            included = self.always_include.match(name, rel_path)
+            if name.startswith(".") and not included:
+                continue
+            if entry.is_dir and self.ignore_folders.match(name, rel_path):
+                continue
+            if entry.is_file and not included:
+                if self.ignore_files.match(name, rel_path):
+                    continue
+                _name, ext = os.path.splitext(name)
+                if ext and self.ignore_extensions.match(ext):
+                    continue
+            if matchers and not included and is_ignored(matchers, rel_path, entry.is_dir):
+                continue
+            entries_filtered.append(entry)
+        return entries_filtered
+
+
+def is_ignored(matchers, rel_path, is_dir):
+    """O nível mais profundo com uma regra aplicável decide."""
+
+    for matcher in reversed(matchers):
+        decision = matcher.match(rel_path, is_dir)
+        if decision is not None:
+            return decision
+    return False
@@ -1,35 +1,368 @@
 import os
 import sys
 
-from PyQt5.QtCore import (QEasingCurve, QPropertyAnimation, Qt, QThread,
-                          QTimer, pyqtSignal)
+from time import perf_counter
+
+from PyQt5.QtCore import (QAbstractListModel, QModelIndex, QObject, Qt,
+                          QThread, QTimer, pyqtSignal)
 from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import (QApplication, QComboBox, QFileDialog, QFrame,
-                             QGraphicsOpacityEffect, QHBoxLayout, QLabel,
-                             QLineEdit, QMainWindow, QPushButton, QScrollArea,
-                             QSplitter, QTextEdit, QVBoxLayout, QWidget)
+from PyQt5.QtWidgets import (QApplication, QCheckBox, QComboBox, QFileDialog, QFrame,
+                             QHBoxLayout, QLabel, QLineEdit, QListView,
+                             QMainWindow, QPushButton, QScrollArea, QSpinBox,
+                             QSplitter, QVBoxLayout, QWidget)
 
-from draw_structure_logic import draw_tree
+from draw_structure_logic import (DEFAULT_WORKERS, FILTER_PARAMS, SIZE_SORT_KEYS, Entry,
+                                  ScanCancelled, ScanStats, iter_largest_lines,
+                                  iter_tree_lines, scan_breadth_first, tree_header)
+from exporters import EXPORT_EXTENSIONS, export_tree, open_export_file
+from git_index import GitIndexError, load_git_tree
+from search_index import SearchIndex
+from snapshot_cache import load_snapshot, save_snapshot
 from styles import DARK_STYLE, LIGHT_STYLE
+from tree_watcher import TreeWatcher
+
+# Espera após a última tecla no campo de caminho antes de varrer o disco
+PATH_DEBOUNCE_MS = 300
+# Intervalo (s) entre blocos de linhas enviados à interface durante a leitura
+LINES_CHUNK_INTERVAL = 0.05
+# Intervalo (s) entre árvores parciais na leitura por níveis
+PARTIAL_INTERVAL = 0.5
 
 
 class Worker(QThread):
-    finished = pyqtSignal(str)
-    def __init__(self, path, params):
+    lines_ready = pyqtSignal(int, list)
+    partial_ready = pyqtSignal(int, list)
+    patched = pyqtSignal(int, list)
+    index_ready = pyqtSignal(int, object)
+    scanned = pyqtSignal(str, object)
+    stats_ready = pyqtSignal(int, object)
+    def __init__(self, generation, path, params, tree=None, stats_hook=None, use_snapshot=False,
+                 patch=False):
         super().__init__()
+        self.generation = generation
         self.path = path
         self.params = params
+        self.tree = tree
+        self.stats_hook = stats_hook
+        self.use_snapshot = use_snapshot
+        # Redesenho depois de uma atualização do TreeWatcher: a saída vai
+        # inteira para `patched`, sem estatísticas nem snapshot
+        self.patch = patch
     def run(self):
         if not self.path or not os.path.isdir(self.path):
-            self.finished.emit("")
+            self.lines_ready.emit(self.generation, [])
+            return
+        stats = ScanStats(on_finish=self.stats_hook)
+        params = dict(self.params)
+        top = params.pop("top", None)
+        source = params.pop("source", "disk")
+        untracked = params.pop("untracked", False)
+        progressive = params.pop("progressive", False) and not self.patch
+        time_budget = params.pop("time_budget", None)
+        # O modelo em memória é preenchido conforme os diretórios são lidos e
+        # reaproveitado pelos próximos Workers do mesmo root
+        tree = self.tree
+        if source == "git":
+            # O índice é relido a cada vez (leva milissegundos); esse modelo não
+            # substitui o do disco nem vai para o snapshot
+            try:
+                tree = load_git_tree(self.path, untracked, stats, self.isInterruptionRequested)
+            except ScanCancelled:
+                return
+            except GitIndexError as e:
+                self.lines_ready.emit(self.generation, [f"Ocorreu um erro: {e}\n"])
+                return
+        elif tree is None:
+            # Snapshot da sessão anterior, revalidado pelo mtime de cada pasta
+            if self.use_snapshot:
+                try:
+                    tree = load_snapshot(self.path, stats, self.isInterruptionRequested)
+                except ScanCancelled:
+                    return
+            if tree is None:
+                tree = Entry(os.path.basename(os.path.normpath(self.path)), self.path, True, False)
+            self.scanned.emit(self.path, tree)
+        unread = None
+        replace = False
+        needs_sizes = (params.get("sizes") or params.get("root_sort_key") in SIZE_SORT_KEYS
+                       or params.get("subdir_sort_key") in SIZE_SORT_KEYS)
+        if (progressive or time_budget) and source == "disk" and not top and not needs_sizes:
+            try:
+                unread, replace = self._scan_by_levels(tree, params, progressive, time_budget, stats)
+            except ScanCancelled:
+                return
+        # Índice da busca, montado junto com as linhas da árvore final
+        index = None
+        if top:
+            # Visão "maiores primeiro" no lugar da árvore
+            filters = {name: params[name] for name in FILTER_PARAMS if name in params}
+            lines = iter_largest_lines(self.path, top, tree=tree, stats=stats,
+                                       is_cancelled=self.isInterruptionRequested, **filters)
+        else:
+            index = SearchIndex(params.get("sizes", False))
+            lines = iter_tree_lines(self.path, **params, is_root=True, tree=tree,
+                                    stats=stats, is_cancelled=self.isInterruptionRequested,
+                                    unread=unread, index=index)
+        chunk = [tree_header(self.path)]
+        if self.patch:
+            try:
+                chunk.extend(lines)
+            except ScanCancelled:
+                return
+            except Exception as e:
+                chunk.append(f"Ocorreu um erro: {e}\n")
+            self.patched.emit(self.generation, chunk)
+            self.index_ready.emit(self.generation, index.finish() if index is not None else None)
             return
-        base_name = os.path.basename(os.path.normpath(self.path))
-        header = f"{base_name}/\n"
+        last_emit = perf_counter()
+        # Depois de árvores parciais, o primeiro bloco substitui a saída
+        emit = self.partial_ready.emit if replace else self.lines_ready.emit
         try:
-            tree_structure = draw_tree(self.path, **self.params, is_root=True)
-            self.finished.emit(header + tree_structure)
+            for line in lines:
+                chunk.append(line)
+                now = perf_counter()
+                if now - last_emit >= LINES_CHUNK_INTERVAL:
+                    emit(self.generation, chunk)
+                    emit = self.lines_ready.emit
+                    chunk = []
+                    last_emit = now
+            emit(self.generation, chunk)
+            self.stats_ready.emit(self.generation, stats.finish())
+            self.index_ready.emit(self.generation, index.finish() if index is not None else None)
+            if self.use_snapshot and source == "disk" and stats.dirs_visited:
+                save_snapshot(tree)
+        except ScanCancelled:
+            pass
         except Exception as e:
-            self.finished.emit(f"Ocorreu um erro: {e}")
+            chunk.append(f"Ocorreu um erro: {e}\n")
+            self.lines_ready.emit(self.generation, chunk)
+    def _scan_by_levels(self, tree, params, progressive, time_budget, stats):
+        # Leitura por níveis antes da renderização final. Com `progressive`,
+        # a árvore parcial vai para `partial_ready` logo após o root e depois a
+        # cada PARTIAL_INTERVAL (mais espaçado se desenhar for demorado).
+        # Retorna `(unread, replace)`: "truncated" se o orçamento acabou e se
+        # alguma árvore parcial foi emitida
+        filters = {name: params[name] for name in FILTER_PARAMS if name in params}
+        scan = scan_breadth_first(tree, stats, self.isInterruptionRequested,
+                                  params.get("max_depth"), params.get("symlinks", "follow"),
+                                  PARTIAL_INTERVAL if progressive else None, time_budget,
+                                  root_sort_key=params.get("root_sort_key", "dirs_first_az"),
+                                  subdir_sort_key=params.get("subdir_sort_key", "dirs_first_az"),
+                                  is_root=True,
+                                  max_entries_per_dir=params.get("max_entries_per_dir"),
+                                  **filters)
+        replace = False
+        render_time = 0.0
+        last_render = perf_counter()
+        for pending, done in scan:
+            if done:
+                return ("truncated" if pending else None), replace
+            if perf_counter() - last_render < 4 * render_time:
+                continue
+            started = perf_counter()
+            lines = [tree_header(self.path)]
+            lines.extend(iter_tree_lines(self.path, **params, is_root=True, tree=tree,
+                                         is_cancelled=self.isInterruptionRequested,
+                                         unread="pending"))
+            self.partial_ready.emit(self.generation, lines)
+            replace = True
+            last_render = perf_counter()
+            render_time = last_render - started
+        return None, replace
+
+class ExportWorker(QThread):
+    """
+    ### Exporta a árvore para um arquivo fora da thread da interface.
+
+    - Lê o disco de novo (não usa o modelo em memória, que pode estar sendo
+      preenchido por um `Worker` ao mesmo tempo)
+    - `done(caminho, entradas)` ao terminar, `failed(mensagem)` em caso de erro
+    """
+    done = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+    def __init__(self, root_path, params, output_path, fmt):
+        super().__init__()
+        self.root_path = root_path
+        self.params = params
+        self.output_path = output_path
+        self.fmt = fmt
+    def run(self):
+        try:
+            with open_export_file(self.output_path) as handle:
+                count = export_tree(self.root_path, handle, self.fmt, **self.params,
+                                    is_root=True, is_cancelled=self.isInterruptionRequested)
+        except ScanCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.done.emit(self.output_path, count)
+
+class ScanScheduler(QObject):
+    """
+    ### Agenda os `Worker` de uma janela.
+
+    - Agrupa pedidos próximos (debounce) em um único `Worker`
+    - No máximo um `Worker` ativo: um novo pedido interrompe o atual e só
+      começa quando ele terminar
+    - Cada pedido recebe um número de geração; resultados de gerações antigas
+      são descartados
+    - `lines_ready(linhas, primeiro_bloco)`: o primeiro bloco de uma geração
+      substitui a saída, os seguintes são acrescentados
+    - Guarda o modelo em memória do último root lido
+    - `index_ready(índice)`: `SearchIndex` da árvore final de cada geração
+      (`None` na visão "maiores primeiro")
+    - `stats_hook(stats)`, se definido, recebe o `ScanStats` de cada
+      `Worker` ao final (na thread do `Worker`), para telemetria
+    - Com `use_snapshots`, o primeiro `Worker` de um root parte do snapshot em
+      disco, e os que leram pastas novas gravam o snapshot ao terminar
+    - `schedule(..., patch=True)` redesenha a partir do modelo já atualizado
+      (ex.: pelo `TreeWatcher`) e entrega a saída completa em
+      `lines_patched(linhas)`, para a interface trocar só as linhas que
+      mudaram; vira um pedido normal se houver um pedido normal em aberto
+    """
+    lines_ready = pyqtSignal(list, bool)
+    lines_patched = pyqtSignal(list)
+    stats_ready = pyqtSignal(object)
+    index_ready = pyqtSignal(object)
+    model_changed = pyqtSignal(object)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.shown_generation = 0
+        self.stats_hook = None
+        self.use_snapshots = False
+        self.worker = None
+        self.pending = None
+        self.tree_model = None
+        self.tree_model_path = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._start_pending)
+    def schedule(self, path, params, delay_ms=0, patch=False):
+        if patch and ((self.pending is not None and not self.pending[3])
+                      or (self.worker is not None and not self.worker.patch)):
+            # A saída em andamento ainda não está completa: redesenha do zero
+            patch = False
+        self.generation += 1
+        self.pending = (self.generation, path, params, patch)
+        if self.worker is not None:
+            self.worker.requestInterruption()
+        self.timer.start(delay_ms)
+    def cancel(self):
+        self.generation += 1
+        self.pending = None
+        self.timer.stop()
+        if self.worker is not None:
+            self.worker.requestInterruption()
+    def invalidate(self):
+        self.tree_model = None
+        self.tree_model_path = None
+        self.model_changed.emit(None)
+    def _start_pending(self):
+        if self.pending is None:
+            return
+        if self.worker is not None:
+            # Espera o Worker interrompido sair; _on_worker_done reagenda
+            self.worker.requestInterruption()
+            return
+        generation, path, params, patch = self.pending
+        self.pending = None
+        tree = self.tree_model if path == self.tree_model_path else None
+        self.worker = Worker(generation, path, params, tree, self.stats_hook,
+                             self.use_snapshots, patch)
+        self.worker.scanned.connect(self._store_tree_model)
+        self.worker.lines_ready.connect(self._on_lines)
+        self.worker.partial_ready.connect(self._on_partial)
+        self.worker.patched.connect(self._on_patched)
+        self.worker.stats_ready.connect(self._on_stats)
+        self.worker.index_ready.connect(self._on_index)
+        self.worker.finished.connect(self._on_worker_done)
+        self.worker.start()
+    def _store_tree_model(self, path, tree):
+        self.tree_model = tree
+        self.tree_model_path = path
+        self.model_changed.emit(tree)
+    def _on_lines(self, generation, lines):
+        if generation != self.generation:
+            return
+        first = generation != self.shown_generation
+        self.shown_generation = generation
+        self.lines_ready.emit(lines, first)
+    def _on_partial(self, generation, lines):
+        # Árvore parcial: sempre substitui a saída
+        if generation != self.generation:
+            return
+        self.shown_generation = generation
+        self.lines_ready.emit(lines, True)
+    def _on_patched(self, generation, lines):
+        if generation != self.generation:
+            return
+        self.shown_generation = generation
+        self.lines_patched.emit(lines)
+    def _on_stats(self, generation, stats):
+        if generation == self.generation:
+            self.stats_ready.emit(stats)
+    def _on_index(self, generation, index):
+        if generation == self.generation:
+            self.index_ready.emit(index)
+    def _on_worker_done(self):
+        self.worker.deleteLater()
+        self.worker = None
+        if self.pending is not None and not self.timer.isActive():
+            self._start_pending()
+
+class TreeLineModel(QAbstractListModel):
+    """
+    ### Linhas da árvore para um `QListView`.
+
+    - A view só consulta e desenha as linhas visíveis, então a saída pode ter
+      centenas de milhares de linhas sem travar a interface
+    - `append_lines` acrescenta blocos enquanto a leitura acontece
+    - `replace_lines` troca só o trecho que difere da saída nova (remove e
+      insere linhas, sem reset), então a rolagem e a seleção se mantêm
+    - `text()` monta o texto completo direto da lista, sem passar por widget
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lines = []
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()].rstrip("\n")
+        return None
+    def set_lines(self, lines):
+        self.beginResetModel()
+        self.lines = list(lines)
+        self.endResetModel()
+    def append_lines(self, lines):
+        if not lines:
+            return
+        start = len(self.lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+    def replace_lines(self, lines):
+        old = self.lines
+        start = 0
+        limit = min(len(old), len(lines))
+        while start < limit and old[start] == lines[start]:
+            start += 1
+        old_end, new_end = len(old), len(lines)
+        while old_end > start and new_end > start and old[old_end - 1] == lines[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+        if old_end > start:
+            self.beginRemoveRows(QModelIndex(), start, old_end - 1)
+            del old[start:old_end]
+            self.endRemoveRows()
+        if new_end > start:
+            self.beginInsertRows(QModelIndex(), start, new_end - 1)
+            old[start:start] = lines[start:new_end]
+            self.endInsertRows()
+    def text(self):
+        return "".join(self.lines)
 
 class TagWidget(QWidget):
     removed = pyqtSignal(str)
@@ -55,7 +388,8 @@ class TagInputWidget(QWidget):
     tags_changed = pyqtSignal()
     def __init__(self, title, suggestions=None):
         super().__init__()
-        self.all_tags = set()
+        # dict em vez de set: a ordem de inserção importa para negações (!)
+        self.all_tags = {}
         self.suggestions = suggestions or []
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -87,7 +421,7 @@ class TagInputWidget(QWidget):
         main_layout.addWidget(scroll)
     def add_tag(self, tag_text):
         if tag_text and tag_text not in self.all_tags:
-            self.all_tags.add(tag_text)
+            self.all_tags[tag_text] = None
             tag_widget = TagWidget(tag_text)
             tag_widget.removed.connect(self.remove_tag)
             self.tags_layout.addWidget(tag_widget)
@@ -99,7 +433,7 @@ class TagInputWidget(QWidget):
         self.entry.clear()
     def remove_tag(self, tag_text):
         if tag_text in self.all_tags:
-            self.all_tags.remove(tag_text)
+            del self.all_tags[tag_text]
             self.update_suggestions()
             self.tags_changed.emit()
     def update_suggestions(self):
@@ -122,7 +456,15 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Gerador de Estrutura de Diretórios")
         self.setGeometry(100, 100, 1200, 700)
         self.is_dark_mode = False
-        self.pending_text_update = ""
+        self.scheduler = ScanScheduler(self)
+        self.scheduler.lines_ready.connect(self._on_lines_ready)
+        self.scheduler.lines_patched.connect(self._on_lines_patched)
+        self.scheduler.stats_ready.connect(self._show_stats)
+        self.scheduler.model_changed.connect(self._on_model_changed)
+        self.scheduler.index_ready.connect(self._on_index_ready)
+        self.search_index = None
+        self.tree_watcher = TreeWatcher(self)
+        self.tree_watcher.tree_changed.connect(self._on_tree_changed)
 
         self.splitter = QSplitter(Qt.Horizontal)
         self.setCentralWidget(self.splitter)
@@ -136,7 +478,7 @@ class MainWindow(QMainWindow):
         dir_layout = QHBoxLayout()
         self.path_edit = QLineEdit()
         self.path_edit.setPlaceholderText("Selecione um diretório...")
-        self.path_edit.textChanged.connect(self.trigger_tree_generation)
+        self.path_edit.textChanged.connect(self._on_path_changed)
         dir_button = QPushButton("Procurar...")
         dir_button.clicked.connect(self.select_directory)
         dir_layout.addWidget(self.path_edit)
@@ -146,6 +488,10 @@ class MainWindow(QMainWindow):
         self.ignore_files = TagInputWidget("Ignorar Arquivos:", suggestions=[".DS_Store"])
         self.ignore_extensions = TagInputWidget("Ignorar Extensões:", suggestions=[".log", ".tmp", ".bak", ".pdf", ".pyc"])
         self.always_include = TagInputWidget("Sempre Incluir:")
+        self.ignore_patterns = TagInputWidget("Padrões (.gitignore):", suggestions=["*.egg-info/", "**/dist/"])
+        self.ignore_patterns.tags_changed.connect(self.trigger_tree_generation)
+        self.use_ignore_files_checkbox = QCheckBox("Respeitar .gitignore e .dockerignore")
+        self.use_ignore_files_checkbox.toggled.connect(lambda _checked: self.trigger_tree_generation())
         self.ignore_folders.tags_changed.connect(self.trigger_tree_generation)
         self.ignore_files.tags_changed.connect(self.trigger_tree_generation)
         self.ignore_extensions.tags_changed.connect(self.trigger_tree_generation)
@@ -154,6 +500,15 @@ class MainWindow(QMainWindow):
         left_layout.addWidget(self.ignore_files)
         left_layout.addWidget(self.ignore_extensions)
         left_layout.addWidget(self.always_include)
+        left_layout.addWidget(self.ignore_patterns)
+        left_layout.addWidget(self.use_ignore_files_checkbox)
+        self.git_index_checkbox = QCheckBox("Só arquivos rastreados pelo git (lê o .git/index)")
+        self.git_index_checkbox.toggled.connect(self._on_git_index_toggled)
+        self.untracked_checkbox = QCheckBox("Incluir arquivos não rastreados")
+        self.untracked_checkbox.setEnabled(False)
+        self.untracked_checkbox.toggled.connect(lambda _checked: self.trigger_tree_generation())
+        left_layout.addWidget(self.git_index_checkbox)
+        left_layout.addWidget(self.untracked_checkbox)
         sort_layout = QVBoxLayout()
         sort_layout.setSpacing(5)
         sort_label = QLabel("Opções de Ordenação")
@@ -161,13 +516,52 @@ class MainWindow(QMainWindow):
         sort_layout.addWidget(sort_label)
         self.root_sort_combo = self.create_sort_combobox()
         self.subdir_sort_combo = self.create_sort_combobox()
-        self.root_sort_combo.currentIndexChanged.connect(self.trigger_tree_generation)
-        self.subdir_sort_combo.currentIndexChanged.connect(self.trigger_tree_generation)
+        self.root_sort_combo.currentIndexChanged.connect(lambda _index: self.trigger_tree_generation())
+        self.subdir_sort_combo.currentIndexChanged.connect(lambda _index: self.trigger_tree_generation())
         sort_layout.addWidget(QLabel("Diretório Raiz:"))
         sort_layout.addWidget(self.root_sort_combo)
         sort_layout.addWidget(QLabel("Subdiretórios:"))
         sort_layout.addWidget(self.subdir_sort_combo)
         left_layout.addLayout(sort_layout)
+        limits_layout = QVBoxLayout()
+        limits_layout.setSpacing(5)
+        limits_label = QLabel("Limites")
+        limits_label.setObjectName("title")
+        limits_layout.addWidget(limits_label)
+        self.max_depth_spin = self.create_limit_spinbox(99)
+        self.max_entries_spin = self.create_limit_spinbox(100000)
+        limits_layout.addWidget(QLabel("Profundidade máxima:"))
+        limits_layout.addWidget(self.max_depth_spin)
+        limits_layout.addWidget(QLabel("Máximo de entradas por pasta:"))
+        limits_layout.addWidget(self.max_entries_spin)
+        self.symlinks_combo = self.create_symlinks_combobox()
+        self.symlinks_combo.currentIndexChanged.connect(lambda _index: self.trigger_tree_generation())
+        limits_layout.addWidget(QLabel("Links simbólicos:"))
+        limits_layout.addWidget(self.symlinks_combo)
+        self.parallel_checkbox = QCheckBox("Ler pastas em paralelo (rede/FUSE)")
+        self.parallel_checkbox.toggled.connect(lambda _checked: self.trigger_tree_generation())
+        limits_layout.addWidget(self.parallel_checkbox)
+        self.sizes_checkbox = QCheckBox("Mostrar tamanhos (como o du)")
+        self.sizes_checkbox.toggled.connect(lambda _checked: self.trigger_tree_generation())
+        limits_layout.addWidget(self.sizes_checkbox)
+        self.top_spin = self.create_limit_spinbox(10000)
+        self.top_spin.setSpecialValueText("Desligado")
+        limits_layout.addWidget(QLabel("Só os N maiores arquivos:"))
+        limits_layout.addWidget(self.top_spin)
+        self.progressive_checkbox = QCheckBox("Mostrar resultados parciais (leitura por níveis)")
+        self.progressive_checkbox.toggled.connect(lambda _checked: self.trigger_tree_generation())
+        limits_layout.addWidget(self.progressive_checkbox)
+        self.time_budget_spin = self.create_limit_spinbox(3600)
+        self.time_budget_spin.setSuffix(" s")
+        limits_layout.addWidget(QLabel("Limite de tempo da leitura:"))
+        limits_layout.addWidget(self.time_budget_spin)
+        left_layout.addLayout(limits_layout)
+        self.watch_checkbox = QCheckBox("Acompanhar alterações no disco")
+        self.watch_checkbox.toggled.connect(self._on_watch_toggled)
+        left_layout.addWidget(self.watch_checkbox)
+        self.snapshot_checkbox = QCheckBox("Guardar a leitura em cache entre sessões")
+        self.snapshot_checkbox.toggled.connect(self._on_snapshot_toggled)
+        left_layout.addWidget(self.snapshot_checkbox)
         left_layout.addStretch()
         self.theme_button = QPushButton()
         self.theme_button.setCursor(Qt.PointingHandCursor)
@@ -179,14 +573,21 @@ class MainWindow(QMainWindow):
         right_layout = QVBoxLayout(right_panel)
         right_layout.setContentsMargins(10, 10, 10, 10)
 
-        self.tree_output = QTextEdit()
-        self.tree_output.setReadOnly(True)
-        
-        self.opacity_effect = QGraphicsOpacityEffect(self.tree_output)
-        self.tree_output.setGraphicsEffect(self.opacity_effect)
-        self.animation = QPropertyAnimation(self.opacity_effect, b"opacity")
-        self.animation.setDuration(200)
-        self.animation.setEasingCurve(QEasingCurve.InOutQuad)
+        self.output_model = TreeLineModel(self)
+        # Resultado da busca; a view troca de modelo enquanto há texto buscado
+        self.search_model = TreeLineModel(self)
+        self.search_edit = QLineEdit()
+        self.search_edit.setObjectName("search_edit")
+        self.search_edit.setPlaceholderText("Buscar por nome…")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(lambda _text: self.run_search())
+        self.tree_output = QListView()
+        self.tree_output.setObjectName("tree_output")
+        self.tree_output.setModel(self.output_model)
+        # Todas as linhas têm a mesma altura: a view não mede linha por linha
+        self.tree_output.setUniformItemSizes(True)
+        self.tree_output.setTextElideMode(Qt.ElideNone)
+        self.tree_output.setSelectionMode(QListView.ExtendedSelection)
 
         self.copy_button = QPushButton("Copiar")
         self.copy_button.setObjectName("copy_button")
@@ -197,13 +598,27 @@ class MainWindow(QMainWindow):
         self.copy_feedback_timer.setSingleShot(True)
         self.copy_feedback_timer.timeout.connect(self._revert_copy_button_style)
         
+        self.export_worker = None
+        self.export_button = QPushButton("Exportar…")
+        self.export_button.setObjectName("export_button")
+        self.export_button.setFixedSize(90, 30)
+        self.export_button.clicked.connect(self.export_tree)
+
         top_right_layout = QHBoxLayout()
-        top_right_layout.addStretch()
+        top_right_layout.addWidget(self.search_edit)
+        top_right_layout.addWidget(self.export_button)
         top_right_layout.addWidget(self.copy_button)
         right_layout.addLayout(top_right_layout)
         right_layout.addWidget(self.tree_output)
 
-        self.splitter.addWidget(left_panel)
+        # O painel esquerdo cresceu; rola na vertical em janelas baixas
+        left_scroll = QScrollArea()
+        left_scroll.setObjectName("left_scroll_area")
+        left_scroll.setWidgetResizable(True)
+        left_scroll.setFrameShape(QFrame.NoFrame)
+        left_scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        left_scroll.setWidget(left_panel)
+        self.splitter.addWidget(left_scroll)
         self.splitter.addWidget(right_panel)
         self.splitter.setSizes([400, 800])
 
@@ -215,53 +630,149 @@ class MainWindow(QMainWindow):
         combo.addItem("Diretórios primeiro (Z-A)", "dirs_first_za")
         combo.addItem("Arquivos primeiro (A-Z)", "files_first_az")
         combo.addItem("Arquivos primeiro (Z-A)", "files_first_za")
+        combo.addItem("Maiores primeiro", "size_desc")
+        combo.addItem("Menores primeiro", "size_asc")
+        combo.addItem("Mais recentes primeiro", "mtime_desc")
+        combo.addItem("Mais antigos primeiro", "mtime_asc")
+        return combo
+
+    def create_symlinks_combobox(self):
+        combo = QComboBox()
+        combo.addItem("Seguir", "follow")
+        combo.addItem("Não seguir", "no_follow")
+        combo.addItem("Seguir uma vez", "follow_once")
+        combo.addItem("Seguir e marcar", "follow_mark")
         return combo
 
+    def create_limit_spinbox(self, maximum):
+        # 0 significa "sem limite"
+        spin = QSpinBox()
+        spin.setRange(0, maximum)
+        spin.setSpecialValueText("Sem limite")
+        spin.setKeyboardTracking(False)
+        spin.valueChanged.connect(lambda _value: self.trigger_tree_generation())
+        return spin
+
     def select_directory(self):
         path = QFileDialog.getExistingDirectory(self, "Selecione o Diretório Raiz")
         if path:
+            # Escolher o diretório de novo força uma nova leitura do disco
+            self.scheduler.invalidate()
+            if path == self.path_edit.text():
+                self.trigger_tree_generation()
             self.path_edit.setText(path)
 
-    def trigger_tree_generation(self):
-        if not self.path_edit.text():
-            self.update_output("")
+    def _show_stats(self, stats):
+        self.statusBar().showMessage(stats.summary())
+        # Diretórios lidos por esta renderização também passam a ser observados
+        if self.watch_checkbox.isChecked():
+            self.tree_watcher.sync()
+
+    def _on_model_changed(self, tree):
+        if self.watch_checkbox.isChecked():
+            self.tree_watcher.set_tree(tree)
+
+    def _on_index_ready(self, index):
+        self.search_index = index
+        if self.search_edit.text():
+            self.run_search()
+
+    def run_search(self):
+        # Busca no índice da última árvore desenhada: não lê o disco
+        query = self.search_edit.text()
+        if not query or self.search_index is None:
+            self.tree_output.setModel(self.output_model)
             return
-        params = {
+        started = perf_counter()
+        positions = self.search_index.search(query)
+        lines = [tree_header(self.path_edit.text())]
+        lines.extend(self.search_index.iter_result_lines(positions))
+        self.search_model.set_lines(lines)
+        if self.tree_output.model() is not self.search_model:
+            self.tree_output.setModel(self.search_model)
+        elapsed_ms = (perf_counter() - started) * 1000
+        self.statusBar().showMessage(f"{len(positions)} resultados para \"{query}\" ({elapsed_ms:.1f} ms)")
+
+    def _on_tree_changed(self):
+        # O TreeWatcher já releu as pastas alteradas no modelo: o redesenho sai
+        # da memória e só as linhas que mudaram são trocadas, sem
+        # "Processando...", sem mexer na barra de status nem no snapshot
+        if self.path_edit.text():
+            self.scheduler.schedule(self.path_edit.text(), self.tree_params(), patch=True)
+
+    def _on_lines_patched(self, lines):
+        self.output_model.replace_lines(lines)
+        # Pastas novas lidas no redesenho também passam a ser observadas
+        if self.watch_checkbox.isChecked():
+            self.tree_watcher.sync()
+
+    def _on_watch_toggled(self, checked):
+        if checked:
+            self.tree_watcher.set_tree(self.scheduler.tree_model)
+        else:
+            self.tree_watcher.stop()
+
+    def _on_git_index_toggled(self, checked):
+        self.untracked_checkbox.setEnabled(checked)
+        self.trigger_tree_generation()
+
+    def _on_snapshot_toggled(self, checked):
+        self.scheduler.use_snapshots = checked
+
+    def closeEvent(self, event):
+        # O Worker pode estar preenchendo o modelo: espera antes de gravá-lo
+        self.scheduler.cancel()
+        if self.scheduler.worker is not None:
+            self.scheduler.worker.wait()
+        if self.scheduler.use_snapshots and self.scheduler.tree_model is not None:
+            save_snapshot(self.scheduler.tree_model)
+        super().closeEvent(event)
+
+    def _on_path_changed(self, _text):
+        self.trigger_tree_generation(PATH_DEBOUNCE_MS)
+
+    def tree_params(self):
+        return {
             "ignore_folders": self.ignore_folders.get_tags(),
             "ignore_files": self.ignore_files.get_tags(),
             "ignore_extensions": self.ignore_extensions.get_tags(),
             "always_include": self.always_include.get_tags(),
             "root_sort_key": self.root_sort_combo.currentData(),
             "subdir_sort_key": self.subdir_sort_combo.currentData(),
+            "max_depth": self.max_depth_spin.value() or None,
+            "max_entries_per_dir": self.max_entries_spin.value() or None,
+            "ignore_patterns": self.ignore_patterns.get_tags(),
+            "use_ignore_files": self.use_ignore_files_checkbox.isChecked(),
+            "symlinks": self.symlinks_combo.currentData(),
+            "workers": DEFAULT_WORKERS if self.parallel_checkbox.isChecked() else None,
+            "sizes": self.sizes_checkbox.isChecked(),
+            "top": self.top_spin.value() or None,
+            "source": "git" if self.git_index_checkbox.isChecked() else "disk",
+            "untracked": self.untracked_checkbox.isChecked(),
+            "progressive": self.progressive_checkbox.isChecked(),
+            "time_budget": self.time_budget_spin.value() or None,
         }
-        path = self.path_edit.text()
+
+    def trigger_tree_generation(self, delay_ms=0):
+        if not self.path_edit.text():
+            self.scheduler.cancel()
+            self.update_output("")
+            return
         self.update_output("Processando...")
-        self.worker = Worker(path, params)
-        self.worker.finished.connect(self.update_output)
-        self.worker.start()
+        self.scheduler.schedule(self.path_edit.text(), self.tree_params(), delay_ms)
 
     def update_output(self, result):
-        self.pending_text_update = result
-        if self.animation.state() == QPropertyAnimation.Running:
-            self.animation.stop()
-        self.animation.setStartValue(self.opacity_effect.opacity())
-        self.animation.setEndValue(0.0)
-        try: self.animation.finished.disconnect()
-        except TypeError: pass
-        self.animation.finished.connect(self._on_fade_out_finished)
-        self.animation.start()
-
-    def _on_fade_out_finished(self):
-        self.tree_output.setPlainText(self.pending_text_update)
-        self.animation.setStartValue(0.0)
-        self.animation.setEndValue(1.0)
-        try: self.animation.finished.disconnect()
-        except TypeError: pass
-        self.animation.start()
+        self.output_model.set_lines(result.splitlines(keepends=True))
+
+    def _on_lines_ready(self, lines, first):
+        if first:
+            self.output_model.set_lines(lines)
+        else:
+            self.output_model.append_lines(lines)
 
     def copy_to_clipboard(self):
         clipboard = QApplication.clipboard()
-        clipboard.setText(self.tree_output.toPlainText())
+        clipboard.setText(self.tree_output.model().text())
         
         self.copy_button.setText("Copiado!")
         self.copy_button.setStyleSheet("background-color: #28a745; color: white; font-weight: bold;")
@@ -269,6 +780,50 @@ class MainWindow(QMainWindow):
         
         self.copy_feedback_timer.start(1500)
 
+    def export_tree(self):
+        root_path = self.path_edit.text()
+        if not root_path or not os.path.isdir(root_path) or self.export_worker is not None:
+            return
+        filters = {
+            "Texto (*.txt)": "text",
+            "JSON (*.json)": "json",
+            "NDJSON (*.ndjson)": "ndjson",
+            "Markdown (*.md)": "markdown",
+            "HTML (*.html)": "html",
+        }
+        name = os.path.basename(os.path.normpath(root_path))
+        output_path, selected = QFileDialog.getSaveFileName(
+            self, "Exportar Estrutura", name, ";;".join(filters))
+        if not output_path:
+            return
+        fmt = filters.get(selected, "text")
+        if not os.path.splitext(output_path)[1]:
+            output_path += EXPORT_EXTENSIONS[fmt]
+        params = self.tree_params()
+        # A exportação é sempre da árvore completa, mesmo com a visão "maiores"
+        # ou um limite de tempo ativos
+        params.pop("top", None)
+        params.pop("progressive", None)
+        params.pop("time_budget", None)
+        self.export_worker = ExportWorker(root_path, params, output_path, fmt)
+        self.export_worker.done.connect(self._on_export_done)
+        self.export_worker.failed.connect(self._on_export_failed)
+        self.export_worker.finished.connect(self._on_export_finished)
+        self.export_button.setEnabled(False)
+        self.export_button.setText("Exportando…")
+        self.export_worker.start()
+
+    def _on_export_done(self, output_path, count):
+        self.statusBar().showMessage(f"{count} entradas exportadas para {output_path}")
+
+    def _on_export_failed(self, message):
+        self.statusBar().showMessage(f"Falha ao exportar: {message}")
+
+    def _on_export_finished(self):
+        self.export_worker = None
+        self.export_button.setText("Exportar…")
+        self.export_button.setEnabled(True)
+
     def _revert_copy_button_style(self):
         self.copy_button.setText("Copiar")
         self.copy_button.setStyleSheet("") 
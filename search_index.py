@@ -0,0 +1,127 @@
+"""
+### Busca instantânea por nome sobre a árvore já desenhada.
+
+- O índice é montado durante a renderização (`iter_tree_lines(...,
+  index=...)`): contém exatamente as entradas da tela, já filtradas e na
+  ordem de exibição, então buscar não lê o disco nem roda `draw_tree` de novo
+- Nomes repetidos (`__init__.py`, `index.js`) entram uma única vez; os
+  trigramas são calculados sobre os nomes distintos em minúsculas
+- O resultado é a árvore podada: as entradas cujo nome contém o texto, com
+  os seus ancestrais, desenhadas com os mesmos conectores
+"""
+
+from draw_structure_logic import Overflow, format_line
+
+
+class SearchIndex:
+    """
+    ### Índice de trigramas dos nomes de uma árvore desenhada.
+
+    - `add(depth, entry)` recebe os itens de `iter_tree_entries` na ordem;
+      a profundidade define o pai de cada entrada
+    - `finish()` monta os trigramas; antes disso a busca varre os nomes
+    - A busca não diferencia maiúsculas e procura o texto em qualquer parte
+      do nome: com 3 caracteres ou mais, só os nomes que têm todos os
+      trigramas do texto são conferidos; textos menores varrem os nomes
+      distintos
+    """
+
+    def __init__(self, sizes=False):
+        self.sizes = sizes
+        # Por posição (ordem de exibição)
+        self.entries = []
+        self.depths = []
+        self.parents = []
+        # Nomes distintos em minúsculas e as posições de cada um
+        self.names = []
+        self.name_ids = {}
+        self.name_positions = []
+        # Trigrama -> ids de nomes distintos
+        self.trigrams = None
+        # Posição do último item de cada profundidade, para achar o pai
+        self._open = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, depth, entry):
+        if entry is None or isinstance(entry, Overflow):
+            return
+        position = len(self.entries)
+        del self._open[depth:]
+        self.parents.append(self._open[-1] if self._open else -1)
+        self._open.append(position)
+        self.entries.append(entry)
+        self.depths.append(depth)
+        name = entry.name.lower()
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            self.name_positions.append([position])
+        else:
+            self.name_positions[name_id].append(position)
+
+    def finish(self):
+        trigrams = {}
+        for name_id, name in enumerate(self.names):
+            for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                ids = trigrams.get(gram)
+                if ids is None:
+                    trigrams[gram] = [name_id]
+                else:
+                    ids.append(name_id)
+        self.trigrams = trigrams
+        self._open = []
+        return self
+
+    def _matching_names(self, query):
+        if len(query) < 3 or self.trigrams is None:
+            return [name_id for name_id, name in enumerate(self.names) if query in name]
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        postings = sorted((self.trigrams.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(ids)
+        names = self.names
+        return [name_id for name_id in candidates if query in names[name_id]]
+
+    def search(self, query):
+        """Posições (ordem de exibição) das entradas cujo nome contém `query`."""
+
+        query = query.lower()
+        if not query:
+            return []
+        positions = []
+        for name_id in self._matching_names(query):
+            positions.extend(self.name_positions[name_id])
+        positions.sort()
+        return positions
+
+    def iter_result_lines(self, positions):
+        """
+        ### Linhas da árvore podada: as posições de `search` e os ancestrais.
+
+        - Mesmo formato de `iter_tree_lines` (sem a linha de separação do
+          root), com os `is_last` recalculados entre as entradas que ficaram
+        """
+
+        parents = self.parents
+        kept = set()
+        for position in positions:
+            while position != -1 and position not in kept:
+                kept.add(position)
+                position = parents[position]
+        shown = sorted(kept)
+        last_child = {}
+        for position in shown:
+            last_child[parents[position]] = position
+        extensions = []
+        for position in shown:
+            depth = self.depths[position]
+            del extensions[depth:]
+            is_last = last_child[parents[position]] == position
+            yield format_line("".join(extensions), is_last, self.entries[position], self.sizes)
+            extensions.append("    " if is_last else "│   ")
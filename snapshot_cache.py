@@ -0,0 +1,323 @@
+"""
+### Cache persistente do modelo em memória (snapshots em disco).
+
+- Um arquivo por root em `<cache do usuário>/dirtree/snapshots`, com o nome
+  derivado do caminho absoluto do root
+- Formato binário compacto, lido via `mmap` sem carregar o arquivo inteiro:
+  cabeçalho e, em pré-ordem, um bloco por diretório lido (mtime da pasta e as
+  entradas com tipo e nome)
+- Ao carregar, cada diretório do snapshot recebe um `stat`: se o mtime for o
+  mesmo, a listagem do snapshot vale; se mudou, só aquela pasta é relida com
+  `refresh_entry` (as subpastas inalteradas continuam vindo do snapshot)
+- Pastas alteradas pouco antes de serem listadas ficam sem mtime no snapshot
+  e são sempre relidas (ver `stable_mtime_ns`)
+- O diretório de cache tem um limite de tamanho; os snapshots usados há mais
+  tempo (mtime do arquivo, atualizado a cada leitura) são apagados primeiro
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+
+from draw_structure_logic import (Entry, ScanCancelled, refresh_entry,
+                                  stable_mtime_ns)
+
+MAGIC = b"DTSNAP"
+VERSION = 1
+
+# Limite padrão do diretório de cache, somando todos os roots
+CACHE_LIMIT_BYTES = 256 * 1024 * 1024
+
+# magic, versão, instante da gravação (ns), diretórios, tamanho do caminho
+HEADER = struct.Struct("<6sHqII")
+# mtime da pasta (ns; 0 = desconhecido), número de entradas
+DIR_BLOCK = struct.Struct("<qI")
+# flags, tamanho do nome
+CHILD = struct.Struct("<BH")
+
+FLAG_DIR = 1
+FLAG_FILE = 2
+FLAG_LINK = 4
+# A pasta foi lida: o bloco dela vem mais adiante, em pré-ordem
+FLAG_LISTED = 8
+
+# `os.fsdecode` sem o custo de uma chamada por nome
+FS_ENCODING = sys.getfilesystemencoding()
+FS_ERRORS = sys.getfilesystemencodeerrors()
+
+
+class SnapshotError(Exception):
+    """Snapshot ilegível (versão antiga, truncado ou corrompido)."""
+
+
+def user_cache_dir():
+    """
+    ### Diretório de cache do DirTree para o usuário atual.
+
+    - `DIRTREE_CACHE_DIR` tem precedência; depois o padrão de cada sistema
+      (`%LOCALAPPDATA%`, `~/Library/Caches`, `$XDG_CACHE_HOME` ou `~/.cache`)
+    """
+
+    override = os.environ.get("DIRTREE_CACHE_DIR")
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "dirtree", "snapshots")
+
+
+def snapshot_path(root_path, cache_dir=None):
+    root = os.path.abspath(root_path)
+    digest = hashlib.sha1(os.fsencode(root)).hexdigest()
+    return os.path.join(cache_dir or user_cache_dir(), f"{digest}.snap")
+
+
+def write_snapshot(tree, handle):
+    """
+    ### Grava o modelo `tree` em `handle` (arquivo binário).
+
+    - Só diretórios já lidos (`children` preenchido) ganham bloco
+    - Retorna quantos diretórios foram gravados
+    """
+
+    root_bytes = os.fsencode(os.path.abspath(tree.path))
+    header_at = handle.tell()
+    handle.write(HEADER.pack(MAGIC, VERSION, 0, 0, len(root_bytes)))
+    handle.write(root_bytes)
+    dir_count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        children = node.children
+        handle.write(DIR_BLOCK.pack(node.listed_mtime_ns or 0, len(children)))
+        listed = []
+        for child in children:
+            name = os.fsencode(child.name)
+            flags = ((FLAG_DIR if child.is_dir else 0) | (FLAG_FILE if child.is_file else 0)
+                     | (FLAG_LINK if child.is_link else 0))
+            if child.is_dir and child.children is not None:
+                flags |= FLAG_LISTED
+                listed.append(child)
+            handle.write(CHILD.pack(flags, len(name)))
+            handle.write(name)
+        stack.extend(reversed(listed))
+        dir_count += 1
+    end = handle.tell()
+    handle.seek(header_at)
+    handle.write(HEADER.pack(MAGIC, VERSION, time.time_ns(), dir_count, len(root_bytes)))
+    handle.seek(end)
+    return dir_count
+
+
+def read_snapshot(data, root_path=None):
+    """
+    ### Reconstrói o modelo a partir dos bytes de um snapshot (ex.: `mmap`).
+
+    - Retorna `(tree, caminho_gravado, instante_da_gravação_ns)`
+    - Os caminhos do modelo partem de `root_path` (padrão: o gravado)
+    - Levanta `SnapshotError` se o conteúdo não for um snapshot válido
+    """
+
+    try:
+        magic, version, written_ns, dir_count, root_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError("formato desconhecido")
+        offset = HEADER.size
+        stored_path = os.fsdecode(data[offset:offset + root_length])
+        offset += root_length
+        root_path = root_path or stored_path
+        tree = Entry(os.path.basename(os.path.normpath(root_path)), root_path, True, False)
+        stack = [tree]
+        unpack_child = CHILD.unpack_from
+        child_size = CHILD.size
+        for _ in range(dir_count):
+            node = stack.pop()
+            mtime_ns, count = DIR_BLOCK.unpack_from(data, offset)
+            offset += DIR_BLOCK.size
+            node.listed_mtime_ns = mtime_ns or None
+            # Mesmo resultado de `os.path.join(node.path, name)`
+            base = node.path if node.path.endswith(os.sep) else node.path + os.sep
+            children = []
+            listed = []
+            for _ in range(count):
+                flags, name_length = unpack_child(data, offset)
+                offset += child_size
+                name = data[offset:offset + name_length].decode(FS_ENCODING, FS_ERRORS)
+                offset += name_length
+                child = Entry(name, base + name, bool(flags & FLAG_DIR),
+                              bool(flags & FLAG_FILE), is_link=bool(flags & FLAG_LINK))
+                if flags & FLAG_LISTED:
+                    listed.append(child)
+                children.append(child)
+            node.children = children
+            stack.extend(reversed(listed))
+    except (struct.error, ValueError, IndexError) as error:
+        raise SnapshotError(str(error)) from error
+    if stack:
+        raise SnapshotError("snapshot truncado")
+    return tree, stored_path, written_ns
+
+
+def read_snapshot_file(path, root_path=None):
+    """
+    ### `read_snapshot` sobre um arquivo, lido via `mmap`.
+
+    - Arquivo vazio levanta `ValueError` (o `mmap` recusa tamanho zero)
+    """
+
+    with open(path, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return read_snapshot(data, root_path)
+
+
+def write_snapshot_file(tree, path):
+    """
+    ### Grava o snapshot de `tree` em `path` de forma atômica.
+
+    - A escrita vai para um arquivo temporário trocado de uma vez
+      (`os.replace`), então leitores nunca veem um snapshot pela metade
+    - Levanta `OSError` se não for possível gravar
+    """
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as handle:
+            write_snapshot(tree, handle)
+        os.replace(temp_path, path)
+    except OSError:
+        _remove(temp_path)
+        raise
+
+
+def revalidate(tree, stats=None, is_cancelled=None):
+    """
+    ### Confere cada diretório do snapshot com o disco.
+
+    - Um `stat` por pasta lida; pastas com mtime diferente (ou sem mtime
+      confiável) são relidas com `refresh_entry`
+    - Pastas que sumiram ficam vazias; a pasta pai, que mudou junto, já as
+      terá removido na maioria dos casos
+    - Retorna quantas pastas foram relidas
+    """
+
+    refreshed = 0
+    stack = [tree]
+    while stack:
+        if is_cancelled is not None and is_cancelled():
+            raise ScanCancelled(tree.path)
+        node = stack.pop()
+        if stats is not None:
+            stats.stat_calls += 1
+        try:
+            info = os.stat(node.path)
+        except OSError:
+            node.children = []
+            continue
+        node.identity = (info.st_dev, info.st_ino)
+        if node.listed_mtime_ns is None or node.listed_mtime_ns != info.st_mtime_ns:
+            # O stat veio antes da nova listagem, então o mtime guardado é seguro
+            node.listed_mtime_ns = stable_mtime_ns(info)
+            refresh_entry(node, stats)
+            refreshed += 1
+        stack.extend(child for child in node.children
+                     if child.is_dir and child.children is not None)
+    return refreshed
+
+
+def load_snapshot(root_path, stats=None, is_cancelled=None, cache_dir=None):
+    """
+    ### Modelo de `root_path` a partir do cache, já revalidado.
+
+    - Retorna `None` se não houver snapshot (ou se ele for ilegível, caso em
+      que o arquivo é apagado)
+    - A leitura marca o snapshot como usado agora (para o LRU)
+    """
+
+    path = snapshot_path(root_path, cache_dir)
+    try:
+        tree, stored_path, _written_ns = read_snapshot_file(path, root_path)
+    except (OSError, ValueError):
+        # Arquivo inexistente ou vazio (o `mmap` recusa tamanho zero)
+        return None
+    except SnapshotError:
+        _remove(path)
+        return None
+    if os.path.normcase(stored_path) != os.path.normcase(os.path.abspath(root_path)):
+        # Colisão de hash: o arquivo é de outro root
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    revalidate(tree, stats, is_cancelled)
+    return tree
+
+
+def save_snapshot(tree, cache_dir=None, limit=CACHE_LIMIT_BYTES):
+    """
+    ### Grava o snapshot de `tree` no cache e aplica o limite do cache.
+
+    - Retorna o caminho do snapshot, ou `None` se não foi possível gravar
+    """
+
+    if tree.children is None:
+        return None
+    cache_dir = cache_dir or user_cache_dir()
+    path = snapshot_path(tree.path, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_snapshot_file(tree, path)
+    except OSError:
+        return None
+    evict(cache_dir, limit, keep=path)
+    return path
+
+
+def evict(cache_dir=None, limit=CACHE_LIMIT_BYTES, keep=None):
+    """
+    ### Apaga os snapshots menos usados até o cache caber em `limit` bytes.
+
+    - `keep` (o snapshot recém-gravado) nunca é apagado
+    - Retorna quantos arquivos foram apagados
+    """
+
+    cache_dir = cache_dir or user_cache_dir()
+    snapshots = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".snap"):
+                    continue
+                try:
+                    info = dir_entry.stat()
+                except OSError:
+                    continue
+                snapshots.append((info.st_mtime, info.st_size, dir_entry.path))
+    except OSError:
+        return 0
+    total = sum(size for _mtime, size, _path in snapshots)
+    removed = 0
+    for _mtime, size, path in sorted(snapshots):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        if _remove(path):
+            total -= size
+            removed += 1
+    return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
@@ -16,14 +16,14 @@ QLabel#title {{
     font-weight: bold;
     font-size: 11pt;
 }}
-QLineEdit, QTextEdit, QComboBox, QScrollArea#tags_scroll_area {{
+QLineEdit, QTextEdit, QListView, QComboBox, QScrollArea#tags_scroll_area {{
     background-color: {LIGHT_WIDGET_BACKGROUND};
     border: 1px solid #ced4da;
     border-radius: 8px;
     padding: 5px;
     color: #212529;
 }}
-QTextEdit {{
+QTextEdit, QListView#tree_output {{
     font-family: "Courier New", monospace;
 }}
 QPushButton {{
@@ -36,12 +36,12 @@ QPushButton:hover {{
     background-color: #dee2e6;
     border-color: #adb5bd;
 }}
-QPushButton#copy_button {{
+QPushButton#copy_button, QPushButton#export_button {{
     background-color: #007bff;
     color: white;
     font-weight: bold;
 }}
-QPushButton#copy_button:hover {{
+QPushButton#copy_button:hover, QPushButton#export_button:hover {{
     background-color: #0069d9;
 }}
 QComboBox QAbstractItemView {{
@@ -90,14 +90,14 @@ QLabel#title {{
     font-weight: bold;
     font-size: 11pt;
 }}
-QLineEdit, QTextEdit, QComboBox, QScrollArea#tags_scroll_area {{
+QLineEdit, QTextEdit, QListView, QComboBox, QScrollArea#tags_scroll_area {{
     background-color: {DARK_WIDGET_BACKGROUND};
     border: 1px solid #495057;
     border-radius: 8px;
     padding: 5px;
     color: #f8f9fa;
 }}
-QTextEdit {{
+QTextEdit, QListView#tree_output {{
     font-family: "Courier New", monospace;
 }}
 QPushButton {{
@@ -111,12 +111,12 @@ QPushButton:hover {{
     background-color: #6c757d;
     border-color: #adb5bd;
 }}
-QPushButton#copy_button {{
+QPushButton#copy_button, QPushButton#export_button {{
     background-color: #0d6efd;
     color: white;
     font-weight: bold;
 }}
-QPushButton#copy_button:hover {{
+QPushButton#copy_button:hover, QPushButton#export_button:hover {{
     background-color: #0b5ed7;
 }}
 QComboBox QAbstractItemView {{
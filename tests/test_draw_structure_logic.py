@@ -0,0 +1,187 @@
+"""
+### Testes de `draw_structure_logic` sobre árvores criadas em `tmp_path`.
+
+Uso:
+    python -m pytest -q tests
+"""
+
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import draw_structure_logic  # noqa: E402
+from draw_structure_logic import (SYMLINK_POLICIES, Entry, ScanStats,  # noqa: E402
+                                  aggregate_sizes, draw_tree, largest_entries,
+                                  list_entries, scan_tree)
+
+
+def make_tree(root, paths):
+    """Cria `paths` abaixo de `root`; nomes terminados em "/" viram pastas."""
+
+    for path in paths:
+        full_path = os.path.join(root, path)
+        if path.endswith("/"):
+            os.makedirs(full_path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as handle:
+                handle.write(path)
+    return str(root)
+
+
+class _DirEntryProxy:
+    # `os.DirEntry` não aceita atributos novos: o proxy conta os `stat()`
+    def __init__(self, dir_entry, calls):
+        self._dir_entry = dir_entry
+        self._calls = calls
+        self.name = dir_entry.name
+        self.path = dir_entry.path
+
+    def is_dir(self):
+        return self._dir_entry.is_dir()
+
+    def is_file(self):
+        return self._dir_entry.is_file()
+
+    def is_symlink(self):
+        return self._dir_entry.is_symlink()
+
+    def stat(self):
+        self._calls.append(self.path)
+        return self._dir_entry.stat()
+
+
+@contextlib.contextmanager
+def count_stats(monkeypatch):
+    """Conta os `os.stat` e `DirEntry.stat()` feitos dentro do bloco."""
+
+    calls = []
+    original_stat = os.stat
+    original_scandir = os.scandir
+
+    def counting_stat(path, *args, **kwargs):
+        calls.append(path)
+        return original_stat(path, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def counting_scandir(path):
+        with original_scandir(path) as it:
+            yield (_DirEntryProxy(dir_entry, calls) for dir_entry in it)
+
+    monkeypatch.setattr(draw_structure_logic.os, "stat", counting_stat)
+    monkeypatch.setattr(draw_structure_logic.os, "scandir", counting_scandir)
+    yield calls
+
+
+SAMPLE = ["a/x.txt", "a/y.txt", "a/b/z.txt", "c/", "d.txt", "e.txt"]
+
+
+def test_stat_calls_match_real_stats(tmp_path, monkeypatch):
+    root = make_tree(tmp_path / "r", SAMPLE)
+    stats = ScanStats()
+    with count_stats(monkeypatch) as calls:
+        draw_tree(root, is_root=True, stats=stats)
+    # Só o stat de identidade das 4 pastas abertas: a classificação vem do scandir
+    assert stats.stat_calls == len(calls) == 4
+    assert stats.entries == 8
+
+
+def test_stat_calls_with_sizes_at_most_one_per_entry(tmp_path, monkeypatch):
+    root = make_tree(tmp_path / "r", SAMPLE)
+    stats = ScanStats()
+    with count_stats(monkeypatch) as calls:
+        draw_tree(root, is_root=True, stats=stats, sizes=True)
+    # Um stat por entrada listada e um para o root; o das pastas também dá a identidade
+    assert stats.stat_calls == len(calls) == stats.entries + 1
+    assert len(set(calls)) == len(calls)
+
+
+def test_list_entries_counts_link_follow(tmp_path):
+    root = make_tree(tmp_path / "r", ["real/f.txt", "g.txt"])
+    os.symlink(os.path.join(root, "real"), os.path.join(root, "link"))
+    os.symlink(os.path.join(root, "missing"), os.path.join(root, "broken"))
+    stats = ScanStats()
+    list_entries(root, stats)
+    # `is_dir()` segue "link" uma vez; no link quebrado, `is_file()` tenta de novo
+    assert stats.stat_calls == 3
+    assert stats.entries == 4
+
+
+def test_link_sorted_before_target_points_to_real_folder(tmp_path):
+    root = make_tree(tmp_path / "r", ["x/f.txt"])
+    os.symlink("x", os.path.join(root, "a_link"))
+    expected = ("├── a_link/ -> x/ [seen]\n"
+                "└── x/\n"
+                "    └── f.txt\n")
+    assert draw_tree(root, is_root=True) == expected
+    assert draw_tree(root, is_root=True, workers=4) == expected
+
+
+def test_folder_opened_by_link_is_still_opened_at_real_path(tmp_path):
+    root = make_tree(tmp_path / "r", ["b/", "z/deep/f.txt"])
+    os.symlink(os.path.join("..", "z", "deep"), os.path.join(root, "b", "to_deep"))
+    os.symlink(os.path.join("..", "z", "deep"), os.path.join(root, "b", "to_deep_2"))
+    assert draw_tree(root, is_root=True) == (
+        "├── b/\n"
+        "│   ├── to_deep/\n"
+        "│   │   └── f.txt\n"
+        "│   └── to_deep_2/ -> b/to_deep/ [seen]\n"
+        "└── z/\n"
+        "    └── deep/\n"
+        "        └── f.txt\n")
+
+
+def make_linked_tree(root):
+    """Pastas com conteúdo, links antes e depois do destino, um link aninhado e um ciclo."""
+
+    root = make_tree(root, ["src/app/main.py", "src/app/util.py", "src/lib/core.py",
+                            "docs/guide.md", "z_real/data/rows.csv", "z_real/notes.txt"])
+    for path, size in (("src/app/main.py", 300), ("src/lib/core.py", 1200),
+                       ("z_real/data/rows.csv", 5000)):
+        with open(os.path.join(root, path), "w", encoding="utf-8") as handle:
+            handle.write("x" * size)
+    os.symlink("z_real", os.path.join(root, "a_link"))
+    os.symlink(os.path.join("..", "src", "lib"), os.path.join(root, "docs", "lib"))
+    os.symlink(os.path.join("..", ".."), os.path.join(root, "src", "app", "up"))
+    os.symlink("src", os.path.join(root, "zz_link"))
+    return root
+
+
+@pytest.mark.parametrize("symlinks", SYMLINK_POLICIES)
+@pytest.mark.parametrize("preload", ["walk", "scan_tree"])
+@pytest.mark.parametrize("params", [{}, {"root_sort_key": "size_desc",
+                                         "subdir_sort_key": "size_desc"},
+                                    {"subdir_sort_key": "mtime_desc"}])
+def test_sizes_same_with_preloaded_model(tmp_path, symlinks, preload, params):
+    root = make_linked_tree(tmp_path / "r")
+    fresh = draw_tree(root, is_root=True, symlinks=symlinks, sizes=True, **params)
+    if preload == "walk":
+        # Como na interface ao ligar "Mostrar tamanhos" depois da primeira leitura
+        tree = Entry("r", root, True, False)
+        draw_tree(root, is_root=True, symlinks=symlinks, tree=tree)
+    else:
+        tree = scan_tree(root)
+    assert draw_tree(root, is_root=True, symlinks=symlinks, tree=tree, sizes=True,
+                     **params) == fresh
+    # De novo sobre o mesmo modelo, já agregado
+    assert draw_tree(root, is_root=True, symlinks=symlinks, tree=tree, sizes=True,
+                     **params) == fresh
+
+
+def test_largest_entries_lists_each_folder_once(tmp_path):
+    root = make_linked_tree(tmp_path / "r")
+    tree = aggregate_sizes(Entry("r", root, True, False))
+    real = next(child for child in tree.children if child.name == "z_real")
+    # A mesma pasta por outro caminho que não é link, como em um bind mount
+    alias = Entry("z_mount", real.path, True, False, children=real.children)
+    alias.size, alias.file_count, alias.mtime = real.size, real.file_count, real.mtime
+    tree.children.append(alias)
+
+    dirs = [rel_path for _size, rel_path, _entry in largest_entries(tree, 10, dirs=True)]
+    assert dirs == ["z_real", "z_real/data", "src", "src/lib", "src/app", "docs"]
+    files = [rel_path for _size, rel_path, _entry in largest_entries(tree, 3)]
+    assert files == ["z_real/data/rows.csv", "src/lib/core.py", "src/app/main.py"]
@@ -0,0 +1,223 @@
+"""
+### Diferença entre duas leituras da mesma árvore.
+
+- Os dois lados são modelos de `scan_tree` ou snapshots (`snapshot_cache`)
+- Cada diretório presente nos dois lados é comparado com um merge das duas
+  listas de filhos ordenadas por nome: custo linear no número de entradas,
+  sem buscas por nome
+- Resultado: entradas adicionadas (`+`), removidas (`-`) e que mudaram de
+  tipo (`~`, ex.: arquivo que virou pasta), desenhadas como árvore com os
+  mesmos conectores de `draw_tree`; pastas sem mudanças ficam de fora e as
+  que só contêm mudanças aparecem sem marcador
+- Links não são comparados por dentro (só o tipo); pastas não lidas em um
+  dos lados (`children is None`) também não
+"""
+
+import os
+
+from draw_structure_logic import scan_tree
+from ignore_rules import GlobSet
+from snapshot_cache import read_snapshot_file
+
+ADDED = "+"
+REMOVED = "-"
+TYPE_CHANGED = "~"
+UNCHANGED = " "
+
+
+class DiffNode:
+    """
+    ### Entrada do resultado de `diff_trees`.
+
+    - `marker` é `"+"`, `"-"`, `"~"` ou `" "` (pasta com mudanças dentro)
+    - `old`/`new` são os `Entry` de cada lado (`None` do lado em que não existe)
+    - `children` só existe em pastas presentes nos dois lados: os `DiffNode`
+      das mudanças abaixo delas
+    """
+
+    __slots__ = ("marker", "old", "new", "children")
+
+    def __init__(self, marker, old, new):
+        self.marker = marker
+        self.old = old
+        self.new = new
+        self.children = None
+
+    @property
+    def entry(self):
+        return self.new if self.new is not None else self.old
+
+    def __repr__(self):
+        return f"DiffNode({self.marker!r}, {self.entry.name!r})"
+
+
+def entry_kind(entry):
+    if entry.is_link:
+        return "link"
+    if entry.is_dir:
+        return "pasta"
+    if entry.is_file:
+        return "arquivo"
+    return "outro"
+
+
+def _by_name(entry):
+    return entry.name
+
+
+def _merge_children(old_children, new_children, rel_dir, pruned):
+    """Merge de duas listagens ordenadas por nome; só as diferenças ficam."""
+
+    if pruned:
+        old_children = [entry for entry in old_children if not _is_pruned(entry, rel_dir, pruned)]
+        new_children = [entry for entry in new_children if not _is_pruned(entry, rel_dir, pruned)]
+    old_sorted = sorted(old_children, key=_by_name)
+    new_sorted = sorted(new_children, key=_by_name)
+    result = []
+    i = j = 0
+    old_count = len(old_sorted)
+    new_count = len(new_sorted)
+    while i < old_count and j < new_count:
+        old = old_sorted[i]
+        new = new_sorted[j]
+        if old.name == new.name:
+            i += 1
+            j += 1
+            if entry_kind(old) != entry_kind(new):
+                result.append(DiffNode(TYPE_CHANGED, old, new))
+            elif (old.is_dir and not old.is_link
+                  and old.children is not None and new.children is not None):
+                result.append(DiffNode(UNCHANGED, old, new))
+        elif old.name < new.name:
+            result.append(DiffNode(REMOVED, old, None))
+            i += 1
+        else:
+            result.append(DiffNode(ADDED, None, new))
+            j += 1
+    result.extend(DiffNode(REMOVED, old, None) for old in old_sorted[i:])
+    result.extend(DiffNode(ADDED, None, new) for new in new_sorted[j:])
+    return result
+
+
+def _is_pruned(entry, rel_dir, pruned):
+    if not entry.is_dir:
+        return False
+    return pruned.match(entry.name, f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+
+
+def _display_key(node):
+    entry = node.entry
+    return (not entry.is_dir, entry.name.lower(), entry.name)
+
+
+def diff_trees(old, new, ignore_folders=None):
+    """
+    ### Compara dois modelos do mesmo root.
+
+    - Retorna o `DiffNode` do root (marcador `" "`); `children` vazio quer
+      dizer que não há diferenças
+    - Pastas de `ignore_folders` (nomes ou globs) são ignoradas nos dois lados
+    - Sem recursão: os pares de pastas são comparados em pré-ordem e depois
+      podados em ordem inversa (filhos antes dos pais)
+    """
+
+    pruned = GlobSet(ignore_folders)
+    root = DiffNode(UNCHANGED, old, new)
+    visited = []
+    stack = [(root, "")]
+    while stack:
+        node, rel_dir = stack.pop()
+        visited.append(node)
+        node.children = _merge_children(node.old.children or [], node.new.children or [],
+                                        rel_dir, pruned)
+        for child in node.children:
+            if child.marker == UNCHANGED:
+                name = child.entry.name
+                stack.append((child, f"{rel_dir}/{name}" if rel_dir else name))
+    for node in reversed(visited):
+        changed = [child for child in node.children
+                   if child.marker != UNCHANGED or child.children]
+        changed.sort(key=_display_key)
+        node.children = changed
+    return root
+
+
+def _subtree_nodes(folder, marker, rel_dir, pruned):
+    # Conteúdo de uma pasta inteira adicionada ou removida
+    if folder.is_link or not folder.children:
+        return []
+    nodes = [DiffNode(marker, entry, None) if marker == REMOVED else DiffNode(marker, None, entry)
+             for entry in folder.children
+             if not (pruned and _is_pruned(entry, rel_dir, pruned))]
+    nodes.sort(key=_display_key)
+    return nodes
+
+
+def _expand(node, rel_dir, pruned):
+    """Filhos a desenhar abaixo de `node` (`rel_dir` é o caminho dele)."""
+
+    if node.marker == UNCHANGED:
+        return node.children
+    if node.marker == ADDED:
+        return _subtree_nodes(node.new, ADDED, rel_dir, pruned)
+    if node.marker == REMOVED:
+        return _subtree_nodes(node.old, REMOVED, rel_dir, pruned)
+    # Mudança de tipo: o conteúdo antigo sai e o novo entra
+    return (_subtree_nodes(node.old, REMOVED, rel_dir, pruned)
+            + _subtree_nodes(node.new, ADDED, rel_dir, pruned))
+
+
+def format_diff_line(prefix, is_last, node):
+    entry = node.entry
+    connector = "└── " if is_last else "├── "
+    display_name = entry.name + "/" if entry.is_dir else entry.name
+    if node.marker == TYPE_CHANGED:
+        display_name += f" ({entry_kind(node.old)} -> {entry_kind(node.new)})"
+    return f"{node.marker} {prefix}{connector}{display_name}\n"
+
+
+def iter_diff_lines(diff, counts=None, ignore_folders=None):
+    """
+    ### Gera as linhas da árvore de diferenças.
+
+    - A primeira linha é o root; as demais começam pelo marcador e um espaço
+    - Pastas adicionadas ou removidas são desenhadas com todo o conteúdo
+    - `counts` (dicionário opcional) recebe quantas entradas de cada marcador
+      foram desenhadas
+    - `ignore_folders` deve ser o mesmo de `diff_trees`; vale também dentro
+      das pastas adicionadas ou removidas
+    """
+
+    pruned = GlobSet(ignore_folders)
+    yield f"  {diff.entry.name}/\n"
+    stack = [(diff.children, 0, "", "")]
+    while stack:
+        nodes, i, prefix, rel_dir = stack[-1]
+        if i >= len(nodes):
+            stack.pop()
+            continue
+        stack[-1] = (nodes, i + 1, prefix, rel_dir)
+        node = nodes[i]
+        is_last = i == len(nodes) - 1
+        if counts is not None and node.marker != UNCHANGED:
+            counts[node.marker] = counts.get(node.marker, 0) + 1
+        yield format_diff_line(prefix, is_last, node)
+        name = node.entry.name
+        child_rel_dir = f"{rel_dir}/{name}" if rel_dir else name
+        children = _expand(node, child_rel_dir, pruned)
+        if children:
+            stack.append((children, 0, prefix + ("    " if is_last else "│   "), child_rel_dir))
+
+
+def load_side(source, stats=None, prune_folders=None):
+    """
+    ### Modelo de um dos lados: diretório (lido agora) ou arquivo de snapshot.
+
+    - Levanta `OSError` se o caminho não existir e `SnapshotError` se o
+      arquivo não for um snapshot
+    """
+
+    if os.path.isdir(source):
+        return scan_tree(source, stats, prune_folders=prune_folders)
+    tree, _stored_path, _written_ns = read_snapshot_file(source)
+    return tree
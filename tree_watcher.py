@@ -0,0 +1,79 @@
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from draw_structure_logic import find_entry, iter_dir_entries, refresh_entry
+
+# Janela para agrupar rajadas de eventos (ex.: um build gravando arquivos)
+COALESCE_MS = 250
+
+
+class TreeWatcher(QObject):
+    """
+    ### Mantém um modelo de `scan_tree` em dia com o disco.
+
+    - Observa os diretórios do modelo com `QFileSystemWatcher`
+    - Eventos de um mesmo intervalo são agrupados e cada diretório alterado é
+      relido uma única vez com `refresh_entry`; o resto da árvore não é tocado
+    - Emite `tree_changed` uma vez por rajada, depois de aplicar as mudanças
+    - Só diretórios já lidos são observados; `sync()` passa a observar os que
+      forem lidos depois (o modelo é preenchido sob demanda)
+    """
+    tree_changed = pyqtSignal()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tree = None
+        self.pending_paths = set()
+        self.watched_paths = set()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._apply_pending)
+    def set_tree(self, tree):
+        self.stop()
+        self.tree = tree
+        self.sync()
+    def sync(self):
+        if self.tree is not None:
+            self._watch(self.tree)
+    def stop(self):
+        self.timer.stop()
+        self.pending_paths.clear()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.watched_paths.clear()
+        self.tree = None
+    def _watch(self, node):
+        # O inotify tem limite de watches; caminhos recusados são ignorados
+        paths = [entry.path for entry in iter_dir_entries(node)
+                 if entry.path not in self.watched_paths]
+        if paths:
+            self.watched_paths.update(paths)
+            self.watcher.addPaths(paths)
+    def _unwatch(self, node):
+        paths = [entry.path for entry in iter_dir_entries(node)
+                 if entry.path in self.watched_paths]
+        if paths:
+            self.watched_paths.difference_update(paths)
+            self.watcher.removePaths(paths)
+    def _on_directory_changed(self, path):
+        self.pending_paths.add(path)
+        self.timer.start(COALESCE_MS)
+    def _apply_pending(self):
+        if self.tree is None:
+            return
+        changed = False
+        # Pais antes dos filhos: se o pai removeu a pasta, o filho é ignorado
+        for path in sorted(self.pending_paths, key=len):
+            node = find_entry(self.tree, path)
+            if node is None or not node.is_dir:
+                continue
+            added_dirs, removed_dirs = refresh_entry(node)
+            for entry in removed_dirs:
+                self._unwatch(entry)
+            for entry in added_dirs:
+                self._watch(entry)
+            changed = True
+        self.pending_paths.clear()
+        if changed:
+            self.tree_changed.emit()